@@ -27,13 +27,13 @@ def fandom_article_url(title: str) -> str:
     return f"{FANDOM_BASE_URL}{quote(slug, safe='_')}"
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Material:
     qty: int
     name: str
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Imbuement:
     category: str
     name: str
@@ -3,35 +3,40 @@ from __future__ import annotations
 """Apply Tibia item IDs from a saved HTML dump to the resource files."""
 
 import argparse
-import html
-import json
 import re
+from itertools import islice
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Iterator
 
-from refresh_market_prices import find_column, normalize_header, normalize_name, parse_tables
+from json_io import dump_json_bytes, load_json_bytes
+from refresh_market_prices import (
+    build_alias_mapping,
+    find_column,
+    normalize_header,
+    normalize_name,
+    parse_tables,
+    strip_highlight_wrappers,
+)
 
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
 DEFAULT_HTML_DUMP = ROOT_DIR / "https___tibia.fandom.com_wiki_Item_IDs.htm"
 RESOURCE_DIR = ROOT_DIR / "resources" / "tibia"
 
+_DIGITS_RE = re.compile(r"\d+")
+ITEM_ID_HEADERS = frozenset(("item", "id"))
 
-def strip_highlight_wrappers(raw_html: str) -> str:
-    """Remove the view-source highlighting wrappers and unescape HTML entities."""
 
-    without_spans = re.sub(r"</?(?:span|a)[^>]*>", "", raw_html)
-    return html.unescape(without_spans)
-
-
-def find_item_id_table(tables: Iterable[list[list[object]]]) -> tuple[list[object], list[list[object]]]:
+def find_item_id_table(tables: Iterable[list[list[object]]]) -> tuple[list[object], Iterator[list[object]]]:
     for table in tables:
         if not table:
             continue
         headers = table[0]
-        normalized_headers = {normalize_header(cell.text) for cell in headers}
-        if {"item", "id"}.issubset(normalized_headers):
-            return headers, table[1:]
+        found: set[str] = set()
+        for cell in headers:
+            found.add(normalize_header(cell.text))
+            if ITEM_ID_HEADERS.issubset(found):
+                return headers, islice(table, 1, None)
     raise RuntimeError("Item ID table not found in the provided HTML dump")
 
 
@@ -50,7 +55,7 @@ def load_item_ids(html_path: Path) -> dict[str, int]:
             continue
         name = row[name_idx].text.strip()
         raw_id = row[id_idx].text.strip()
-        match = re.search(r"\d+", raw_id)
+        match = _DIGITS_RE.search(raw_id)
         if not name or not match:
             continue
         mapping[normalize_name(name)] = int(match.group(0))
@@ -59,39 +64,34 @@ def load_item_ids(html_path: Path) -> dict[str, int]:
     return mapping
 
 
-def build_alias_mapping(mapping: dict[str, int]) -> dict[str, int]:
-    aliases: dict[str, int] = {}
-    alias_pairs = {
-        "Frozen Claw (Ice Horror)": "Frozen Claw",
-        "Darklight Core": "Darklight Core (Object)",
-        "Darklight Matter": "Darklight Matter (Object)",
-        "Gore Horn": "Gore Horn (Item)",
-        "Silencer Claw": "Silencer Claws",
-    }
-    for target, source in alias_pairs.items():
-        source_id = mapping.get(normalize_name(source))
-        if source_id is not None:
-            aliases[normalize_name(target)] = source_id
-    return aliases
-
-
 def apply_ids_to_items(items: list[dict[str, object]], mapping: dict[str, int], aliases: dict[str, int]) -> int:
     updated = 0
+    mapping_get = mapping.get
+    aliases_get = aliases.get
     for item in items:
-        normalized = normalize_name(str(item.get("name", "")))
-        item_id = mapping.get(normalized) or aliases.get(normalized)
-        if item_id is not None:
-            if item.get("id") != item_id:
-                item["id"] = item_id
-                updated += 1
+        name = item.get("name")
+        if not isinstance(name, str):
+            if name is None:
+                continue
+            name = str(name)
+        normalized = normalize_name(name)
+        # Direct mapping entries take precedence over aliases for the same name.
+        item_id = mapping_get(normalized)
+        if item_id is None:
+            item_id = aliases_get(normalized)
+            if item_id is None:
+                continue
+        if "id" not in item or item["id"] != item_id:
+            item["id"] = item_id
+            updated += 1
     return updated
 
 
 def update_resource(path: Path, mapping: dict[str, int], aliases: dict[str, int]) -> int:
-    payload = json.loads(path.read_text(encoding="utf-8"))
+    payload = load_json_bytes(path.read_bytes())
     items = payload.get("items", [])
     updated = apply_ids_to_items(items, mapping, aliases)
-    path.write_text(json.dumps(payload, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    path.write_bytes(dump_json_bytes(payload))
     return updated
 
 
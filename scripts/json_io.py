@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+"""JSON helpers shared by the refresh scripts; orjson is used when it is installed."""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def dump_json_bytes(payload: object) -> bytes:
+    """Serialize ``payload`` as 2-space indented UTF-8 JSON with a trailing newline."""
+
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS)
+    return (json.dumps(payload, ensure_ascii=False, indent=2) + "\n").encode("utf-8")
+
+
+def load_json_bytes(data: bytes) -> object:
+    """Parse UTF-8 JSON straight from bytes, skipping the intermediate ``str`` decode."""
+
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
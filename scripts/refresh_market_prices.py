@@ -3,25 +3,57 @@ from __future__ import annotations
 import argparse
 import html
 import json
+import os
+import pickle
 import random
 import re
 import threading
 import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from html.parser import HTMLParser
+from http.client import HTTPConnection, HTTPException, HTTPMessage, HTTPResponse, HTTPSConnection
 from pathlib import Path
-from typing import Callable, Iterable
+from types import MappingProxyType
+from typing import Callable, Iterable, Mapping
 from urllib.error import HTTPError, URLError
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urlsplit
 from urllib.request import Request, urlopen
 
+try:
+    from selectolax.lexbor import LexborHTMLParser as FastHTMLParser
+except ImportError:  # pragma: no cover - optional dependency
+    FastHTMLParser = None
+
+try:
+    from lxml import etree as lxml_etree
+    from lxml import html as lxml_html
+except ImportError:  # pragma: no cover - optional dependency
+    lxml_etree = None
+    lxml_html = None
+
+# Imported as scripts.refresh_market_prices by the app, and as a top-level module when run from scripts/.
+try:
+    from .json_io import dump_json_bytes, load_json_bytes
+except ImportError:
+    from json_io import dump_json_bytes, load_json_bytes
+
 MARKET_VALUES_URL = "https://api.tibiamarket.top/market_values"
 WORLD_DATA_URL = "https://api.tibiamarket.top/world_data"
 USER_AGENT = "Mozilla/5.0 (compatible; TibiaSearchBot/1.0)"
 _SESSION_REFRESH_LOCK = threading.Lock()
 _SESSION_REFRESHED_SERVERS: set[str] = set()
+# path -> ((st_mtime_ns, st_size), pickled payload); callers mutate what load_json returns, so each hit unpickles a fresh copy.
+_JSON_CACHE: dict[Path, tuple[tuple[int, int], bytes]] = {}
+_JSON_CACHE_LOCK = threading.Lock()
+# Set as the interpreter starts shutting down. Batch workers are non-daemon pool threads that exit joins, so every
+# throttle and retry wait goes through this event instead of time.sleep and ends as soon as exit begins.
+_SHUTDOWN = threading.Event()
+# threading's own exit hooks run newest first, so this fires before concurrent.futures joins the pool workers.
+threading._register_atexit(_SHUTDOWN.set)
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
 RESOURCE_DIR = ROOT_DIR / "resources" / "tibia"
@@ -32,6 +64,7 @@ MARKET_REFRESH_META_FILE = RESOURCE_DIR / "market_refresh_meta.json"
 
 CACHE_TTL = timedelta(hours=6)
 THROTTLE_SECONDS = 1.0
+THROTTLE_BURST = 1
 RETRY_JITTER_RANGE = (0.1, 0.3)
 BACKOFF_NO_RETRY_AFTER = [
     (2.0, 5.0),
@@ -39,105 +72,269 @@ BACKOFF_NO_RETRY_AFTER = [
     (10.0, 25.0),
 ]
 SERVER_ERROR_BACKOFF = (1.0, 3.0)
-BATCH_DELAY_SECONDS = 1.0
+RATE_LIMIT_LOW_WATERMARK = 1
+DUMP_CHUNK_SIZE = 64 * 1024
+
+_WS_RE = re.compile(r"\s+")
+_HILITE_RE = re.compile(r"</?(?:span|a)\b[^>]*>")
+_CELL_TAGS = frozenset(("td", "th"))
+_REQUIRED_ITEM_ID_HEADERS = frozenset(("item", "id"))
+_ITEM_NAME_COLUMNS = ("name", "item")
+_ITEM_ID_COLUMNS = ("item id", "id")
+BATCH_SIZE = 100
+DEFAULT_CONCURRENCY = 4
 
 
 class Throttle:
-    def __init__(self, delay_seconds: float) -> None:
+    """Token bucket refilled at one token per ``delay_seconds``, holding at most ``burst`` tokens.
+
+    Callers take a token up front and sleep off any deficit, so concurrent workers are spaced out
+    instead of racing for the same slot. Use ``for_host`` to share one bucket per API host.
+    """
+
+    _shared: dict[tuple[str, float, int], Throttle] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, delay_seconds: float, burst: int = 1) -> None:
         self.delay_seconds = delay_seconds
-        self._last_request_at: float | None = None
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._not_before = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_host(cls, url: str, delay_seconds: float, burst: int = 1) -> Throttle:
+        key = (urlsplit(url).netloc, delay_seconds, max(1, burst))
+        with cls._shared_lock:
+            throttle = cls._shared.get(key)
+            if throttle is None:
+                throttle = cls._shared[key] = cls(delay_seconds, burst)
+        return throttle
+
+    def _refill(self, now: float) -> None:
+        if self.delay_seconds <= 0:
+            self._tokens = float(self.burst)
+        else:
+            self._tokens = min(float(self.burst), self._tokens + (now - self._last_refill) / self.delay_seconds)
+        self._last_refill = now
 
     def required_delay(self) -> float:
-        if self._last_request_at is None:
-            return 0.0
-        elapsed = time.monotonic() - self._last_request_at
-        return max(0.0, self.delay_seconds - elapsed)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return max(0.0, (1.0 - self._tokens) * self.delay_seconds, self._not_before - now)
+
+    def defer_until(self, timestamp: float) -> None:
+        """Hold back the next request until ``timestamp`` (``time.monotonic`` clock)."""
+
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if timestamp <= now:
+                return
+            if self.delay_seconds > 0:
+                # Drain the bucket so the next token only appears at ``timestamp``; later waiters stay spaced.
+                self._tokens = min(self._tokens, 1.0 - (timestamp - now) / self.delay_seconds)
+            self._not_before = max(self._not_before, timestamp)
 
     def wait(self, log: Callable[[str], None] | None = None) -> None:
-        delay = self.required_delay()
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1.0
+            delay = max(0.0, -self._tokens * self.delay_seconds, self._not_before - now)
         if delay > 0:
             if log:
                 log(f"Throttle active; waiting {delay:.2f}s before next request")
-            time.sleep(delay)
-
-    def mark(self) -> None:
-        self._last_request_at = time.monotonic()
+            _SHUTDOWN.wait(delay)
 
 
 @dataclass
+class HttpResponse:
+    status: int
+    headers: HTTPMessage
+    body: bytes
+
+    def read(self) -> bytes:
+        return self.body
+
+    def json(self) -> object:
+        return load_json_bytes(self.body)
+
+
+class HttpSession:
+    """Keep one persistent HTTP(S) connection per host and thread so repeated requests skip the handshake."""
+
+    def __init__(self, timeout: float = 30.0, headers: dict[str, str] | None = None) -> None:
+        self.timeout = timeout
+        self.headers = {"User-Agent": USER_AGENT, **(headers or {})}
+        self._local = threading.local()
+        # Every connection opened by any thread, so close() also reaches worker-thread connections.
+        self._opened: list[HTTPConnection] = []
+        self._opened_lock = threading.Lock()
+
+    def _connection(self, scheme: str, netloc: str) -> HTTPConnection:
+        connections: dict[tuple[str, str], HTTPConnection] | None = getattr(self._local, "connections", None)
+        if connections is None:
+            connections = self._local.connections = {}
+        connection = connections.get((scheme, netloc))
+        if connection is None:
+            connection_cls = HTTPSConnection if scheme == "https" else HTTPConnection
+            connection = connection_cls(netloc, timeout=self.timeout)
+            connections[(scheme, netloc)] = connection
+            with self._opened_lock:
+                self._opened.append(connection)
+        return connection
+
+    def _open(self, url: str) -> tuple[HTTPConnection, HTTPResponse]:
+        parts = urlsplit(url)
+        target = parts.path or "/"
+        if parts.query:
+            target = f"{target}?{parts.query}"
+        # A pooled connection may have been dropped by the server while idle; retry once on a fresh one.
+        for attempt in range(2):
+            connection = self._connection(parts.scheme, parts.netloc)
+            try:
+                connection.request("GET", target, headers=self.headers)
+                return connection, connection.getresponse()
+            except (ConnectionResetError, BrokenPipeError) as exc:
+                connection.close()
+                if attempt == 0:
+                    continue
+                raise URLError(exc) from exc
+            except (OSError, HTTPException) as exc:
+                connection.close()
+                raise URLError(exc) from exc
+        raise URLError(f"GET {url} failed")
+
+    def get(self, url: str) -> HttpResponse:
+        connection, response = self._open(url)
+        body = self._read_or_close(connection, response)
+        if not 200 <= response.status < 300:
+            raise HTTPError(url, response.status, response.reason, response.headers, None)
+        return HttpResponse(status=response.status, headers=response.headers, body=body)
+
+    @staticmethod
+    def _read_or_close(connection: HTTPConnection, response: HTTPResponse) -> bytes:
+        try:
+            return response.read()
+        except (OSError, HTTPException) as exc:
+            connection.close()
+            raise URLError(exc) from exc
+
+    def close(self) -> None:
+        with self._opened_lock:
+            opened, self._opened = self._opened, []
+        for connection in opened:
+            connection.close()
+        # Closed connections reconnect on next use, so per-thread maps can keep pointing at them.
+
+
+@dataclass(slots=True)
 class HtmlCell:
     text: str
 
 
+class TableComplete(Exception):
+    """Raised out of ``TableParser.feed`` once the table matching ``required_headers`` is closed."""
+
+
 class TableParser(HTMLParser):
-    def __init__(self) -> None:
+    def __init__(self, required_headers: Iterable[str] | None = None) -> None:
         super().__init__()
+        self.required_headers = frozenset(required_headers) if required_headers is not None else None
+        # Set once a table whose header row covers ``required_headers`` has been closed.
+        self.done = False
         self.tables: list[list[list[HtmlCell]]] = []
+        # None until the current table's header row is seen; False means its rows are skipped.
+        self._capture: bool | None = None
         self._in_table = False
         self._in_row = False
         self._in_cell = False
         self._current_table: list[list[HtmlCell]] = []
         self._current_row: list[HtmlCell] = []
+        # One entry per text run; a run that straddles two feed() calls arrives as several handle_data calls.
         self._cell_text: list[str] = []
+        self._in_text_run = False
 
     def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self._in_text_run = False
+        if self.done:
+            return
         if tag == "table":
             self._in_table = True
             self._current_table = []
+            self._capture = None
         if not self._in_table:
             return
         if tag == "tr":
             self._in_row = True
             self._current_row = []
-        elif tag in {"td", "th"} and self._in_row:
+        elif tag in _CELL_TAGS and self._in_row and self._capture is not False:
             self._in_cell = True
             self._cell_text = []
 
     def handle_data(self, data: str) -> None:
-        if self._in_cell:
+        if not self._in_cell:
+            return
+        if self._in_text_run:
+            self._cell_text[-1] += data
+        else:
             self._cell_text.append(data)
+            self._in_text_run = True
+
+    def handle_comment(self, data: str) -> None:
+        self._in_text_run = False
 
     def handle_endtag(self, tag: str) -> None:
+        self._in_text_run = False
         if tag == "table" and self._in_table:
             self._in_table = False
             if self._current_table:
                 self.tables.append(self._current_table)
             self._current_table = []
+            if self._capture:
+                self.done = True
+                raise TableComplete
         elif tag == "tr" and self._in_row:
             self._in_row = False
             if self._current_row:
-                self._current_table.append(self._current_row)
+                if self._capture is None and self.required_headers is not None:
+                    self._capture = self._matches_required_headers(self._current_row)
+                if self._capture is not False:
+                    self._current_table.append(self._current_row)
             self._current_row = []
-        elif tag in {"td", "th"} and self._in_cell:
+        elif tag in _CELL_TAGS and self._in_cell:
             self._in_cell = False
-            text = " ".join(part.strip() for part in self._cell_text if part.strip())
+            # Same whitespace collapsing as the selectolax/lxml paths.
+            text = " ".join(" ".join(self._cell_text).split())
             self._current_row.append(HtmlCell(text=text))
             self._cell_text = []
 
+    def _matches_required_headers(self, headers: list[HtmlCell]) -> bool:
+        return self.required_headers.issubset(normalize_header(cell.text) for cell in headers)
+
 
 def iso_timestamp() -> str:
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
 
 
+@lru_cache(maxsize=8192)
 def normalize_header(value: str) -> str:
-    return re.sub(r"\s+", " ", value.strip().lower())
+    return _WS_RE.sub(" ", value.strip().lower())
 
 
+@lru_cache(maxsize=8192)
 def normalize_name(value: str) -> str:
     cleaned = value.strip().replace("’", "'")
-    cleaned = re.sub(r"\s+", " ", cleaned)
+    cleaned = _WS_RE.sub(" ", cleaned)
     return cleaned.lower()
 
 
 def load_market_refresh_meta(path: Path = MARKET_REFRESH_META_FILE) -> dict[str, dict[str, str]]:
-    if not path.exists():
-        return {
-            "market_last_update_by_server": {},
-            "market_last_refresh_at_by_server": {},
-        }
-    try:
-        payload = json.loads(path.read_text(encoding="utf-8"))
-    except json.JSONDecodeError:
+    payload = _load_json_file(path)
+    if payload is None:
         return {
             "market_last_update_by_server": {},
             "market_last_refresh_at_by_server": {},
@@ -149,14 +346,65 @@ def load_market_refresh_meta(path: Path = MARKET_REFRESH_META_FILE) -> dict[str,
 
 
 def save_market_refresh_meta(data: dict[str, dict[str, str]], path: Path = MARKET_REFRESH_META_FILE) -> None:
-    path.write_text(json.dumps(data, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    write_json_atomic(path, data)
+
+
+def _load_json_file(path: Path) -> dict | None:
+    try:
+        return load_json_bytes(path.read_bytes())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_json_atomic(path: Path, payload: object) -> None:
+    data = dump_json_bytes(payload)
+    # Leave the file (and its mtime) alone when the serialized content is identical.
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return
+    except FileNotFoundError:
+        pass
+    # Unique temp name per thread so concurrent refreshes never share a partial file.
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
 
 
 def strip_highlight_wrappers(raw_html: str) -> str:
     """Remove view-source highlighting wrappers and unescape HTML entities."""
 
-    without_spans = re.sub(r"</?(?:span|a)[^>]*>", "", raw_html)
-    return html.unescape(without_spans)
+    return html.unescape(_HILITE_RE.sub("", raw_html))
+
+
+def _stream_split_index(text: str) -> int:
+    """Return how much of ``text`` can be stripped without cutting a tag or entity in half."""
+
+    split = len(text)
+    tag_start = text.rfind("<")
+    if tag_start != -1 and text.find(">", tag_start) == -1:
+        split = tag_start
+    # Entity names are at most 32 characters long (see html.unescape).
+    entity_start = text.rfind("&", max(0, split - 34), split)
+    if entity_start != -1 and ";" not in text[entity_start:split]:
+        split = entity_start
+    return split
+
+
+def iter_stripped_chunks(handle, chunk_size: int = DUMP_CHUNK_SIZE) -> Iterable[str]:
+    """Yield ``strip_highlight_wrappers`` output for a view-source dump read in chunks."""
+
+    carry = ""
+    while chunk := handle.read(chunk_size):
+        text = carry + chunk
+        split = _stream_split_index(text)
+        carry = text[split:]
+        if split:
+            yield strip_highlight_wrappers(text[:split])
+    if carry:
+        yield strip_highlight_wrappers(carry)
 
 
 def fetch_html(url: str, log: Callable[[str], None] | None = None) -> str:
@@ -172,29 +420,116 @@ def fetch_html(url: str, log: Callable[[str], None] | None = None) -> str:
 
 
 def parse_tables(html: str) -> list[list[list[HtmlCell]]]:
+    if FastHTMLParser is not None:
+        return _parse_tables_fast(html)
+    if lxml_html is not None:
+        return _parse_tables_lxml(html)
     parser = TableParser()
     parser.feed(html)
     return parser.tables
 
 
+def _parse_tables_fast(html: str) -> list[list[list[HtmlCell]]]:
+    """Extract tables with selectolax; mirrors ``TableParser`` output with whitespace collapsed."""
+
+    tables: list[list[list[HtmlCell]]] = []
+    for table_node in FastHTMLParser(html).css("table"):
+        rows: list[list[HtmlCell]] = []
+        for row_node in table_node.css("tr"):
+            cells = [
+                HtmlCell(text=" ".join(child.text(deep=True, separator=" ").split()))
+                for child in row_node.iter()
+                if child.tag in _CELL_TAGS
+            ]
+            if cells:
+                rows.append(cells)
+        if rows:
+            tables.append(rows)
+    return tables
+
+
+def _parse_tables_lxml(html: str) -> list[list[list[HtmlCell]]]:
+    """Extract tables with lxml when selectolax is unavailable; same output shape as ``_parse_tables_fast``."""
+
+    try:
+        root = lxml_html.fromstring(html)
+    except lxml_etree.LxmlError:
+        # "Document is empty": no tables, as with the other parsers.
+        return []
+    tables: list[list[list[HtmlCell]]] = []
+    for table_node in root.iter("table"):
+        rows: list[list[HtmlCell]] = []
+        for row_node in table_node.iter("tr"):
+            cells = [
+                HtmlCell(text=" ".join(" ".join(child.itertext()).split()))
+                for child in row_node
+                if child.tag in _CELL_TAGS
+            ]
+            if cells:
+                rows.append(cells)
+        if rows:
+            tables.append(rows)
+    return tables
+
+
+def _stream_tables_lxml(handle, required_headers: frozenset[str]) -> list[list[list[HtmlCell]]]:
+    """Pull-parse the dump with lxml, keeping only finished rows, until a table with ``required_headers`` closes."""
+
+    parser = lxml_etree.HTMLPullParser(events=("end",), tag=("tr", "table"))
+    tables: list[list[list[HtmlCell]]] = []
+    rows: list[list[HtmlCell]] = []
+    for decoded_chunk in iter_stripped_chunks(handle):
+        parser.feed(decoded_chunk)
+        for _, element in parser.read_events():
+            if element.tag == "tr":
+                cells = [
+                    HtmlCell(text=" ".join(" ".join(child.itertext()).split()))
+                    for child in element
+                    if child.tag in _CELL_TAGS
+                ]
+                if cells:
+                    rows.append(cells)
+                # Drop the row and its already-processed siblings so the tree never holds more than one row.
+                element.clear(keep_tail=True)
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+                continue
+            if rows:
+                tables.append(rows)
+                rows = []
+                if find_table(tables[-1:], required_headers):
+                    return tables
+    try:
+        parser.close()
+    except lxml_etree.LxmlError:
+        # Raised for a dump with no elements at all; there is nothing left to collect.
+        pass
+    if rows:
+        tables.append(rows)
+    return tables
+
+
 def find_table(
     tables: Iterable[list[list[HtmlCell]]],
-    required_headers: set[str],
+    required_headers: frozenset[str],
 ) -> tuple[list[HtmlCell], list[list[HtmlCell]]] | None:
     for table in tables:
-        if not table:
+        if not table or len(table[0]) < len(required_headers):
             continue
         headers = table[0]
-        header_names = {normalize_header(cell.text) for cell in headers}
-        if required_headers.issubset(header_names):
-            return headers, table[1:]
+        remaining = set(required_headers)
+        for cell in headers:
+            remaining.discard(normalize_header(cell.text))
+            if not remaining:
+                return headers, table[1:]
     return None
 
 
 def find_column(headers: list[HtmlCell], candidates: Iterable[str]) -> int | None:
+    # Candidates are listed in priority order, so the first candidate that matches any header wins.
     normalized = [normalize_header(cell.text) for cell in headers]
-    for idx, name in enumerate(normalized):
-        for candidate in candidates:
+    for candidate in candidates:
+        for idx, name in enumerate(normalized):
             if candidate in name:
                 return idx
     return None
@@ -204,16 +539,31 @@ def fetch_item_ids(log: Callable[[str], None] | None = None) -> dict[str, int]:
     del log  # no-op to align with existing signature
     if not ITEM_IDS_DUMP_PATH.exists():
         raise RuntimeError(f"Item IDs dump not found: {ITEM_IDS_DUMP_PATH}")
-    raw_html = ITEM_IDS_DUMP_PATH.read_text(encoding="utf-8")
-    decoded_html = strip_highlight_wrappers(raw_html)
-    tables = parse_tables(decoded_html)
-    table = find_table(tables, {"item", "id"})
+    with ITEM_IDS_DUMP_PATH.open("r", encoding="utf-8") as handle:
+        if lxml_etree is not None:
+            tables = _stream_tables_lxml(handle, _REQUIRED_ITEM_ID_HEADERS)
+        elif FastHTMLParser is not None:
+            # selectolax has no incremental API, so it gets the whole stripped document.
+            tables = parse_tables(strip_highlight_wrappers(handle.read()))
+        else:
+            # Pure-Python fallback: stream the dump and stop once the ID table is complete.
+            parser = TableParser(required_headers=_REQUIRED_ITEM_ID_HEADERS)
+            try:
+                for decoded_chunk in iter_stripped_chunks(handle):
+                    parser.feed(decoded_chunk)
+                parser.close()
+            except TableComplete:
+                pass
+            tables = parser.tables
+    table = find_table(tables, _REQUIRED_ITEM_ID_HEADERS)
     if not table:
         raise RuntimeError("Item IDs table not found in saved dump")
     headers, rows = table
-    name_idx = find_column(headers, ["name", "item"]) or 0
-    id_idx = find_column(headers, ["item id", "id"]) or 1
+    name_idx = find_column(headers, _ITEM_NAME_COLUMNS) or 0
+    id_idx = find_column(headers, _ITEM_ID_COLUMNS) or 1
 
+    # Every dump row is a distinct name seen once; bypass the cache so it keeps the resource names.
+    normalize = normalize_name.__wrapped__
     mapping: dict[str, int] = {}
     for row in rows:
         if name_idx >= len(row) or id_idx >= len(row):
@@ -222,67 +572,93 @@ def fetch_item_ids(log: Callable[[str], None] | None = None) -> dict[str, int]:
         raw_id = row[id_idx].text.strip()
         if not name or not raw_id:
             continue
-        match = re.search(r"\d+", raw_id)
-        if not match:
+        item_id = _first_int(raw_id)
+        if item_id is None:
             continue
-        mapping[normalize_name(name)] = int(match.group(0))
+        mapping[normalize(name)] = item_id
     return mapping
 
 
-def build_alias_mapping(mapping: dict[str, int]) -> dict[str, int]:
-    aliases: dict[str, int] = {}
-    alias_pairs = {
+def _first_int(text: str) -> int | None:
+    """Return the first run of ASCII digits in ``text`` (``"3031, 3032"`` -> 3031), or None."""
+
+    if text.isascii() and text.isdigit():
+        return int(text)
+    end = len(text)
+    start = 0
+    while start < end and not "0" <= text[start] <= "9":
+        start += 1
+    stop = start
+    while stop < end and "0" <= text[stop] <= "9":
+        stop += 1
+    return int(text[start:stop]) if stop > start else None
+
+
+_ALIAS_PAIRS_NORMALIZED = tuple(
+    (normalize_name(target), normalize_name(source))
+    for target, source in {
         "Frozen Claw (Ice Horror)": "Frozen Claw",
         "Darklight Core": "Darklight Core (Object)",
         "Darklight Matter": "Darklight Matter (Object)",
         "Gore Horn": "Gore Horn (Item)",
         "Silencer Claw": "Silencer Claws",
-    }
-    for target, source in alias_pairs.items():
-        source_id = mapping.get(normalize_name(source))
-        if source_id is not None:
-            aliases[normalize_name(target)] = source_id
-    return aliases
+    }.items()
+)
+
+
+def build_alias_mapping(mapping: dict[str, int]) -> dict[str, int]:
+    get = mapping.get
+    return {target: source_id for target, source in _ALIAS_PAIRS_NORMALIZED if (source_id := get(source)) is not None}
+
+
+def _file_signature(path: Path) -> tuple[int, int]:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _remember_json(path: Path, signature: tuple[int, int], payload: dict) -> None:
+    with _JSON_CACHE_LOCK:
+        _JSON_CACHE[path] = (signature, pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL))
 
 
 def load_json(path: Path) -> dict:
-    return json.loads(path.read_text(encoding="utf-8"))
+    signature = _file_signature(path)
+    with _JSON_CACHE_LOCK:
+        cached = _JSON_CACHE.get(path)
+    if cached is not None and cached[0] == signature:
+        return pickle.loads(cached[1])
+    payload = load_json_bytes(path.read_bytes())
+    _remember_json(path, signature, payload)
+    return payload
 
 
 def save_json(path: Path, payload: dict) -> None:
-    path.write_text(json.dumps(payload, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    write_json_atomic(path, payload)
+    _remember_json(path, _file_signature(path), payload)
 
 
 def load_cache() -> dict | None:
-    if not CACHE_FILE.exists():
-        return None
-    try:
-        return json.loads(CACHE_FILE.read_text(encoding="utf-8"))
-    except json.JSONDecodeError:
-        return None
+    return _load_json_file(CACHE_FILE)
 
 
 def load_item_ids_cache() -> dict | None:
-    if not ITEM_IDS_CACHE_FILE.exists():
-        return None
-    try:
-        return json.loads(ITEM_IDS_CACHE_FILE.read_text(encoding="utf-8"))
-    except json.JSONDecodeError:
-        return None
+    return _load_json_file(ITEM_IDS_CACHE_FILE)
 
 
 def save_item_ids_cache(mapping: dict[str, int]) -> None:
     payload = {
         "fetched_at": iso_timestamp(),
+        "fetched_epoch": int(time.time()),
         "items": mapping,
     }
-    ITEM_IDS_CACHE_FILE.write_text(
-        json.dumps(payload, ensure_ascii=False, indent=2) + "\n",
-        encoding="utf-8",
-    )
+    write_json_atomic(ITEM_IDS_CACHE_FILE, payload)
 
 
-def item_ids_cache_is_fresh(cache: dict) -> bool:
+def _fetched_within_ttl(cache: dict) -> bool:
+    fetched_epoch = cache.get("fetched_epoch")
+    if type(fetched_epoch) is int:
+        return time.time() - fetched_epoch < CACHE_TTL.total_seconds()
+    # Caches written before fetched_epoch existed only carry the ISO timestamp.
     fetched_at = cache.get("fetched_at")
     if not fetched_at:
         return False
@@ -293,68 +669,108 @@ def item_ids_cache_is_fresh(cache: dict) -> bool:
     return datetime.now(timezone.utc) - timestamp < CACHE_TTL
 
 
+def load_name_to_id_cache() -> dict[str, int] | None:
+    """Return the alias-merged name -> ID lookup from a fresh item ID cache, or None.
+
+    The parsed lookup is memoized per file version (mtime, size), so repeated refreshes in one
+    process skip the JSON decode and alias build. Callers must treat the result as read-only.
+    """
+
+    try:
+        signature = _file_signature(ITEM_IDS_CACHE_FILE)
+    except FileNotFoundError:
+        return None
+    # A file last written outside the TTL cannot hold a fresh fetch; skip parsing it.
+    if time.time() - signature[0] / 1e9 >= CACHE_TTL.total_seconds():
+        return None
+    snapshot = _name_to_id_snapshot(ITEM_IDS_CACHE_FILE, signature)
+    if snapshot is None or not item_ids_cache_is_fresh(snapshot[0]):
+        return None
+    return snapshot[1]
+
+
+@lru_cache(maxsize=2)
+def _name_to_id_snapshot(path: Path, signature: tuple[int, int]) -> tuple[dict, dict[str, int]] | None:
+    del signature  # cache key only
+    ids_cache = _load_json_file(path)
+    if not isinstance(ids_cache, dict) or not isinstance(ids_cache.get("items"), dict):
+        return None
+    name_to_id = {str(key): int(value) for key, value in ids_cache["items"].items()}
+    stamps = {key: ids_cache[key] for key in ("fetched_at", "fetched_epoch") if key in ids_cache}
+    return stamps, {**name_to_id, **build_alias_mapping(name_to_id)}
+
+
+def item_ids_cache_is_fresh(cache: dict) -> bool:
+    return _fetched_within_ttl(cache)
+
+
 def cache_is_fresh(cache: dict, server: str) -> bool:
     if cache.get("server") != server:
         return False
-    fetched_at = cache.get("fetched_at")
-    if not fetched_at:
-        return False
-    try:
-        timestamp = datetime.fromisoformat(fetched_at.replace("Z", "+00:00"))
-    except ValueError:
-        return False
-    return datetime.now(timezone.utc) - timestamp < CACHE_TTL
+    return _fetched_within_ttl(cache)
 
 
 def save_cache(server: str, items: dict[int, int]) -> None:
     payload = {
         "server": server,
         "fetched_at": iso_timestamp(),
-        "items": {str(key): value for key, value in items.items()},
+        "fetched_epoch": int(time.time()),
+        # Integer keys are written as JSON strings by both orjson (OPT_NON_STR_KEYS) and stdlib json.
+        "items": items,
     }
-    CACHE_FILE.write_text(json.dumps(payload, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    write_json_atomic(CACHE_FILE, payload)
+
+
+def _as_int(value: object) -> int | None:
+    if type(value) is int:
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
 
 
-def _decode_json_response(response) -> object:
-    return json.loads(response.read().decode("utf-8"))
+def item_id_column(items: list[dict[str, object]]) -> list[int | None]:
+    """Return the stored ID of every item by position, None where an item has none yet."""
 
+    return [item_id if isinstance(item_id := item.get("id"), int) else None for item in items]
 
-def apply_item_ids(items: list[dict[str, object]], name_to_id: dict[str, int]) -> list[int]:
-    item_ids: list[int] = []
-    for item in items:
-        name = str(item.get("name", ""))
-        normalized = normalize_name(name)
-        item_id = item.get("id")
-        if not isinstance(item_id, int):
-            item_id = name_to_id.get(normalized)
-            if item_id is not None:
-                item["id"] = item_id
-        if isinstance(item_id, int):
-            item_ids.append(item_id)
-    return item_ids
+
+def resolve_ids(items: list[dict[str, object]], resolved: list[int | None], name_to_id: dict[str, int]) -> bool:
+    """Fill the None slots of ``resolved`` (and the matching items) by name; return whether any ID was attached."""
+
+    attached = False
+    for idx in [idx for idx, item_id in enumerate(resolved) if item_id is None]:
+        item = items[idx]
+        item_id = name_to_id.get(normalize_name(str(item.get("name", ""))))
+        if item_id is not None:
+            item["id"] = item_id
+            resolved[idx] = item_id
+            attached = True
+    return attached
 
 
 def update_items_with_prices(
     items: list[dict[str, object]],
-    name_to_id: dict[str, int],
+    resolved_ids: list[int | None],
     market_values: dict[int, int] | None,
     processed_ids: set[int] | None = None,
-) -> tuple[int, int, int]:
+) -> tuple[int, int, int, bool]:
+    """Apply market prices to items using the parallel ID list from ``item_id_column``/``resolve_ids``.
+
+    The trailing flag reports whether any ``gold`` value actually changed.
+    """
+
     updated = 0
     without_price = 0
     missing_ids = 0
-    for item in items:
-        name = str(item.get("name", ""))
-        normalized = normalize_name(name)
-        item_id = item.get("id")
-        if not isinstance(item_id, int):
-            item_id = name_to_id.get(normalized)
-            if item_id is not None:
-                item["id"] = item_id
-        if not isinstance(item_id, int):
+    changed = False
+    for item, item_id in zip(items, resolved_ids):
+        if item_id is None:
             missing_ids += 1
             if market_values is None:
                 continue
+            changed = changed or item.get("gold") != 0
             item["gold"] = 0
             without_price += 1
             continue
@@ -364,12 +780,14 @@ def update_items_with_prices(
             continue
         sell_offer = market_values.get(item_id)
         if sell_offer is None or sell_offer == -1:
-            item["gold"] = 0
+            gold = 0
             without_price += 1
         else:
-            item["gold"] = int(sell_offer)
+            gold = int(sell_offer)
+        changed = changed or item.get("gold") != gold
+        item["gold"] = gold
         updated += 1
-    return updated, without_price, missing_ids
+    return updated, without_price, missing_ids, changed
 
 
 def refresh_market_prices(
@@ -380,7 +798,10 @@ def refresh_market_prices(
         log(f"Starting market refresh for server {server}")
 
     refresher = MarketRefresher(resource_dir=RESOURCE_DIR, log=log)
-    return refresher.refresh_server(server)
+    try:
+        return refresher.refresh_server(server)
+    finally:
+        refresher.close()
 
 
 class MarketRefresher:
@@ -389,18 +810,29 @@ class MarketRefresher:
         resource_dir: Path,
         log: Callable[[str], None] | None = None,
         throttle_seconds: float = THROTTLE_SECONDS,
+        throttle_burst: int = THROTTLE_BURST,
         market_values_url: str = MARKET_VALUES_URL,
         world_data_url: str = WORLD_DATA_URL,
+        session: HttpSession | None = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        allow_partial_refresh: bool = True,
     ) -> None:
         self.resource_dir = resource_dir
         self.log = log
         self.market_values_url = market_values_url
         self.world_data_url = world_data_url
         self.throttle_seconds = throttle_seconds
+        self.concurrency = max(1, concurrency)
+        self.allow_partial_refresh = allow_partial_refresh
         self.meta_file = self.resource_dir / "market_refresh_meta.json"
         self._flights: dict[str, _ServerFlight] = defaultdict(_ServerFlight)
         self._flights_lock = threading.Lock()
-        self._throttle = Throttle(delay_seconds=throttle_seconds)
+        # Shared per host, so refreshes for different servers draw from the same request budget.
+        self._throttle = Throttle.for_host(market_values_url, delay_seconds=throttle_seconds, burst=throttle_burst)
+        self._session = session or HttpSession()
+
+    def close(self) -> None:
+        self._session.close()
 
     def _log(self, message: str) -> None:
         if self.log:
@@ -412,14 +844,12 @@ class MarketRefresher:
                 self._log(f"Session refresh already completed for {server}; skipping API calls")
                 with self._flights_lock:
                     flight = self._flights.get(server)
-                result = dict(flight.last_result or {}) if flight else {}
-                result.setdefault("server", server)
-                result.setdefault("status", "session_skipped")
-                result.setdefault("skipped", True)
-                return result
+                last_result = flight.last_result if flight else None
+                return {"server": server, "status": "session_skipped", "skipped": True, **(last_result or {})}
 
         with self._flights_lock:
             flight = self._flights[server]
+        joined = False
         with flight.lock:
             if flight.in_progress:
                 self._log(f"Refresh already in progress for {server}; joining existing run")
@@ -427,11 +857,13 @@ class MarketRefresher:
                 while flight.in_progress:
                     flight.condition.wait()
                 flight.waiters -= 1
-                result = dict(flight.last_result or {})
-                result.setdefault("server", server)
-                result.setdefault("status", "joined")
-                return result
-            flight.in_progress = True
+                joined = True
+                last_result = flight.last_result
+            else:
+                flight.in_progress = True
+        if joined:
+            # Build this caller's copy outside the flight lock.
+            return {"server": server, "status": "joined", **(last_result or {})}
 
         start = time.monotonic()
         result: dict[str, int | str] | None = None
@@ -442,11 +874,14 @@ class MarketRefresher:
             duration = time.monotonic() - start
             with flight.lock:
                 flight.in_progress = False
-                flight.last_result = {
-                    "server": server,
-                    "duration_seconds": duration,
-                    **(result or {}),
-                }
+                # Read-only so joiners can share it without copying under the lock.
+                flight.last_result = MappingProxyType(
+                    {
+                        "server": server,
+                        "duration_seconds": duration,
+                        **(result or {}),
+                    }
+                )
                 flight.condition.notify_all()
             with _SESSION_REFRESH_LOCK:
                 _SESSION_REFRESHED_SERVERS.add(server)
@@ -475,75 +910,84 @@ class MarketRefresher:
         creature_data = load_json(creature_path)
         delivery_data = load_json(delivery_path)
 
-        name_to_id: dict[str, int] | None = None
-        ids_cache = load_item_ids_cache()
-        if ids_cache and item_ids_cache_is_fresh(ids_cache):
-            cached_items = ids_cache.get("items")
-            if isinstance(cached_items, dict):
-                name_to_id = {str(key): int(value) for key, value in cached_items.items()}
-        if name_to_id is None:
+        creature_items = creature_data.get("items", [])
+        delivery_items = delivery_data.get("items", [])
+        creature_ids = item_id_column(creature_items)
+        delivery_ids = item_id_column(delivery_items)
+        creature_changed = delivery_changed = False
+        # The name -> ID table is only needed for items that do not carry an ID yet.
+        if None in creature_ids or None in delivery_ids:
             try:
-                name_to_id = fetch_item_ids(log=self.log)
+                name_to_id = self._load_name_to_id()
             except RuntimeError as exc:
                 self._log(f"Failed to fetch item ids: {exc}")
                 return {"server": server, "error": "item_ids"}
-            save_item_ids_cache(name_to_id)
-        aliases = build_alias_mapping(name_to_id)
-        name_to_id = {**name_to_id, **aliases}
-
-        item_ids: list[int] = []
-        item_ids.extend(apply_item_ids(creature_data.get("items", []), name_to_id))
-        item_ids.extend(apply_item_ids(delivery_data.get("items", []), name_to_id))
-        item_ids = sorted(set(item_ids))
+            creature_changed = resolve_ids(creature_items, creature_ids, name_to_id)
+            delivery_changed = resolve_ids(delivery_items, delivery_ids, name_to_id)
+        # First-seen order is deterministic for a given pair of resource files; the API does not need sorted IDs.
+        item_ids = [item_id for item_id in dict.fromkeys(creature_ids + delivery_ids) if item_id is not None]
 
         market_values: dict[int, int] = {}
         processed_ids: set[int] = set()
         failed_batches = 0
-        total_batches = 0
-
-        for batch_start in range(0, len(item_ids), 100):
-            batch = item_ids[batch_start : batch_start + 100]
-            if total_batches > 0:
-                self._throttle.wait(log=self.log)
-            total_batches += 1
-            batch_values = self._fetch_market_batch(server, batch)
-            if batch_values is None:
-                failed_batches += 1
-                self._log(f"Failed to fetch batch starting at offset {batch_start} for {server}; skipping updates for this batch")
-                continue
-            market_values.update(batch_values)
-            processed_ids.update(batch)
-            if BATCH_DELAY_SECONDS > 0 and batch_start + 100 < len(item_ids):
-                self._log(f"Batch processed, sleeping {BATCH_DELAY_SECONDS:.2f}s before next batch")
-                time.sleep(BATCH_DELAY_SECONDS)
+        offsets = range(0, len(item_ids), BATCH_SIZE)
+        batches = [item_ids[batch_start : batch_start + BATCH_SIZE] for batch_start in offsets]
+        total_batches = len(batches)
+
+        # Batches are independent; the shared throttle keeps the request rate in check across workers.
+        if batches:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, total_batches)) as executor:
+                results = executor.map(lambda batch: self._fetch_market_batch(server, batch), batches)
+                for batch_start, batch, batch_values in zip(offsets, batches, results):
+                    if batch_values is None:
+                        failed_batches += 1
+                        self._log(f"Failed to fetch batch starting at offset {batch_start} for {server}; skipping updates for this batch")
+                        continue
+                    market_values.update(batch_values)
+                    processed_ids.update(batch)
+
+        if failed_batches and not self.allow_partial_refresh:
+            # Leave resources and meta untouched so the next run retries the whole scan.
+            self._log(f"{failed_batches} of {total_batches} batches failed for {server}; not saving a partial refresh")
+            return {
+                "server": server,
+                "error": "failed_batches",
+                "batches": total_batches,
+                "failed_batches": failed_batches,
+            }
 
         updated = 0
         without_price = 0
         missing_ids = 0
 
         if processed_ids:
-            updated_count, without_count, missing_count = update_items_with_prices(
-                creature_data.get("items", []),
-                name_to_id,
+            updated_count, without_count, missing_count, gold_changed = update_items_with_prices(
+                creature_items,
+                creature_ids,
                 market_values,
                 processed_ids=processed_ids,
             )
             updated += updated_count
             without_price += without_count
             missing_ids += missing_count
+            creature_changed = creature_changed or gold_changed
 
-            updated_count, without_count, missing_count = update_items_with_prices(
-                delivery_data.get("items", []),
-                name_to_id,
+            updated_count, without_count, missing_count, gold_changed = update_items_with_prices(
+                delivery_items,
+                delivery_ids,
                 market_values,
                 processed_ids=processed_ids,
             )
             updated += updated_count
             without_price += without_count
             missing_ids += missing_count
+            delivery_changed = delivery_changed or gold_changed
 
-            save_json(creature_path, creature_data)
-            save_json(delivery_path, delivery_data)
+            # Re-encoding a resource file is the most expensive step of a refresh; skip it when nothing moved.
+            if creature_changed:
+                save_json(creature_path, creature_data)
+            if delivery_changed:
+                save_json(delivery_path, delivery_data)
 
         if last_update_remote:
             meta["market_last_update_by_server"][server] = last_update_remote
@@ -569,13 +1013,45 @@ class MarketRefresher:
         )
         return summary
 
+    def _load_name_to_id(self) -> dict[str, int]:
+        cached = load_name_to_id_cache()
+        if cached is not None:
+            return cached
+        name_to_id = self._fetch_item_ids_once()
+        return {**name_to_id, **build_alias_mapping(name_to_id)}
+
+    def _fetch_item_ids_once(self) -> dict[str, int]:
+        """Parse the item IDs dump, letting concurrent refreshes share a single parse."""
+
+        flight = _ITEM_IDS_FLIGHT
+        with flight.lock:
+            if flight.in_progress:
+                self._log("Item IDs are already being parsed; waiting for that result")
+                flight.waiters += 1
+                while flight.in_progress:
+                    flight.condition.wait()
+                flight.waiters -= 1
+                if flight.last_result is None:
+                    raise RuntimeError("Concurrent item IDs fetch failed")
+                return flight.last_result
+            flight.in_progress = True
+
+        mapping: dict[str, int] | None = None
+        try:
+            mapping = fetch_item_ids(log=self.log)
+            save_item_ids_cache(mapping)
+            return mapping
+        finally:
+            with flight.lock:
+                flight.in_progress = False
+                flight.last_result = mapping
+                flight.condition.notify_all()
+
     def _fetch_world_data(self, server: str) -> dict:
         params = urlencode({"servers": server})
         url = f"{self.world_data_url}?{params}"
         self._log(f"GET {url}")
-        request = Request(url, headers={"User-Agent": USER_AGENT})
-        with urlopen(request, timeout=30) as response:
-            payload = _decode_json_response(response)
+        payload = self._session.get(url).json()
         if not isinstance(payload, dict):
             return {}
         return payload
@@ -591,56 +1067,76 @@ class MarketRefresher:
         return None
 
     def _fetch_market_batch(self, server: str, batch: list[int]) -> dict[int, int] | None:
-        params = urlencode(
-            {
-                "server": server,
-                "item_ids": ",".join(str(item_id) for item_id in batch),
-                "limit": 100,
-            }
-        )
+        params = urlencode({"server": server, "item_ids": ",".join(map(str, batch)), "limit": 100})
         url = f"{self.market_values_url}?{params}"
         max_attempts = 3
 
         for attempt in range(1, max_attempts + 1):
             self._throttle.wait(log=self.log)
-            self._log(f"GET {url} (attempt {attempt}/{max_attempts})")
-            request = Request(url, headers={"User-Agent": USER_AGENT})
-            try:
-                with urlopen(request, timeout=30) as response:
-                    payload = _decode_json_response(response)
-                self._throttle.mark()
-                return self._parse_market_values(payload)
-            except HTTPError as exc:
-                self._throttle.mark()
-                if exc.code == 429:
-                    wait_seconds = self._compute_retry_after(exc, attempt)
-                    if attempt == max_attempts:
-                        self._log(f"HTTP 429 on final attempt for {server} batch {batch[0]}-{batch[-1]}, giving up")
-                        return None
-                    self._log(f"HTTP 429 received; waiting {wait_seconds:.2f}s before retrying")
-                    time.sleep(wait_seconds)
-                    continue
-                if 500 <= exc.code < 600:
-                    if attempt == max_attempts:
-                        self._log(f"Server error {exc.code} on final attempt for {server} batch {batch[0]}-{batch[-1]}, giving up")
-                        return None
-                    wait_seconds = random.uniform(*SERVER_ERROR_BACKOFF)
-                    wait_seconds = max(wait_seconds, self._throttle.required_delay())
-                    self._log(f"Server error {exc.code}; retrying in {wait_seconds:.2f}s")
-                    time.sleep(wait_seconds)
-                    continue
-                self._log(f"HTTP error {exc.code} for {server} batch {batch[0]}-{batch[-1]}: {exc}; not retrying")
+            if _SHUTDOWN.is_set():
                 return None
+            if self.log:
+                # The full URL is logged once per batch; retries only name the batch.
+                if attempt == 1:
+                    self.log(f"GET {url}")
+                else:
+                    self.log(f"Retrying {server} batch {batch[0]}-{batch[-1]} (attempt {attempt}/{max_attempts})")
+            try:
+                response = self._session.get(url)
+                self._apply_rate_limit_headers(response.headers)
+                return self._parse_market_values(response.json())
             except (URLError, json.JSONDecodeError) as exc:
-                self._throttle.mark()
-                if attempt == max_attempts:
-                    self._log(f"Request failed on attempt {attempt} for {server} batch {batch[0]}-{batch[-1]}: {exc}")
-                    return None
-                wait_seconds = max(random.uniform(*SERVER_ERROR_BACKOFF), self._throttle.required_delay())
-                self._log(f"Request error: {exc}; retrying in {wait_seconds:.2f}s")
-                time.sleep(wait_seconds)
+                failure = exc
+            wait_seconds = self._retry_delay(failure, attempt)
+            if wait_seconds is None:
+                self._log(f"Request failed for {server} batch {batch[0]}-{batch[-1]}: {failure}; not retrying")
+                return None
+            if attempt == max_attempts:
+                self._log(f"Request failed on final attempt for {server} batch {batch[0]}-{batch[-1]}: {failure}; giving up")
+                return None
+            self._log(f"Request failed: {failure}; retrying in {wait_seconds:.2f}s")
+            if _SHUTDOWN.wait(wait_seconds):
+                return None
         return None
 
+    def _retry_delay(self, exc: Exception, attempt: int) -> float | None:
+        """Seconds to wait before retrying after ``exc``, or None when the failure is not retryable.
+
+        429 honours Retry-After and also defers the shared throttle, so every worker backs off, not just this one.
+        Other HTTP errors below 500 are final; 5xx, network and decode errors use the server-error backoff.
+        """
+
+        if isinstance(exc, HTTPError):
+            if exc.code == 429:
+                wait_seconds = self._compute_retry_after(exc, attempt)
+                self._throttle.defer_until(time.monotonic() + wait_seconds)
+                return wait_seconds
+            if exc.code < 500:
+                return None
+        return max(random.uniform(*SERVER_ERROR_BACKOFF), self._throttle.required_delay())
+
+    def _apply_rate_limit_headers(self, headers) -> None:
+        """Slow down before the API starts answering 429 when it reports a nearly spent quota."""
+
+        if not headers:
+            return
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        try:
+            remaining_count = int(remaining)
+            reset_seconds = float(reset)
+        except (TypeError, ValueError):
+            return
+        if remaining_count > RATE_LIMIT_LOW_WATERMARK or reset_seconds <= 0:
+            return
+        # Some APIs send the reset as a Unix timestamp rather than a number of seconds.
+        if reset_seconds > 1_000_000_000:
+            reset_seconds = max(0.0, reset_seconds - time.time())
+        self._log(f"Rate limit nearly exhausted ({remaining_count} left); deferring requests for {reset_seconds:.2f}s")
+        self._throttle.defer_until(time.monotonic() + reset_seconds)
+
     def _compute_retry_after(self, exc: HTTPError, attempt: int) -> float:
         retry_after = exc.headers.get("Retry-After") if exc.headers else None
         base_delay: float
@@ -662,25 +1158,12 @@ class MarketRefresher:
             items = payload
         if not items:
             return {}
-        market_values: dict[int, int] = {}
-        for entry in items:
-            if not isinstance(entry, dict):
-                continue
-            try:
-                entry_id = int(entry.get("id"))
-            except (TypeError, ValueError):
-                continue
-            sell_offer = entry.get("sell_offer")
-            if sell_offer is None:
-                market_values[entry_id] = 0
-                continue
-            try:
-                sell_value = int(sell_offer)
-            except (TypeError, ValueError):
-                market_values[entry_id] = 0
-                continue
-            market_values[entry_id] = 0 if sell_value == -1 else max(0, sell_value)
-        return market_values
+        # Missing, malformed and -1 ("no offer") sell prices all map to 0.
+        return {
+            entry_id: max(0, _as_int(entry.get("sell_offer")) or 0)
+            for entry in items
+            if isinstance(entry, dict) and (entry_id := _as_int(entry.get("id"))) is not None
+        }
 
 
 class _ServerFlight:
@@ -689,7 +1172,10 @@ class _ServerFlight:
         self.condition = threading.Condition(self.lock)
         self.in_progress = False
         self.waiters = 0
-        self.last_result: dict[str, int | str] | None = None
+        self.last_result: Mapping[str, object] | None = None
+
+
+_ITEM_IDS_FLIGHT = _ServerFlight()
 
 
 def main() -> None:
@@ -703,19 +1189,28 @@ def main() -> None:
     parser.add_argument(
         "--delay-between-batches",
         type=float,
-        default=DELAY_BETWEEN_BATCHES_SECONDS,
-        help="Seconds to wait between batch requests (default: 12).",
+        default=THROTTLE_SECONDS,
+        help="Minimum seconds between market API requests (default: 1).",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="Number of market batches fetched in parallel (default: 4).",
     )
     args = parser.parse_args()
 
     refresher = MarketRefresher(
         resource_dir=RESOURCE_DIR,
         log=print,
-        delay_between_batches_seconds=args.delay_between_batches,
         throttle_seconds=args.delay_between_batches,
+        concurrency=args.concurrency,
         allow_partial_refresh=args.allow_partial_refresh,
     )
-    refresher.refresh_server(args.server)
+    try:
+        refresher.refresh_server(args.server)
+    finally:
+        refresher.close()
 
 
 if __name__ == "__main__":
@@ -2,19 +2,34 @@ from __future__ import annotations
 
 """Refresh Tibia item resources with a snapshot fallback when scraping is blocked."""
 
-import json
+import codecs
 import re
 import sys
 import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timezone
+from functools import lru_cache
 from html.parser import HTMLParser
+from http.client import HTTPException
 from pathlib import Path
-from typing import Iterable
-from urllib.error import URLError
+from typing import Iterable, Iterator
 from urllib.parse import urljoin, quote
 from urllib.request import Request, urlopen
 
+# Imported as scripts.refresh_tibia_items by the tests, and as a top-level module when run from scripts/.
+try:
+    from .json_io import dump_json_bytes, load_json_bytes
+except ImportError:
+    from json_io import dump_json_bytes, load_json_bytes
+
+try:
+    from lxml import etree as lxml_etree
+    from lxml import html as lxml_html
+except ImportError:  # pragma: no cover - optional dependency
+    lxml_etree = None
+    lxml_html = None
+
 CREATURE_PRODUCTS_URL = "https://tibia.fandom.com/wiki/Creature_Products"
 DELIVERY_TASK_ITEMS_URL = "https://tibiopedia.pl/items/others/delivery"
 
@@ -23,9 +38,23 @@ RESOURCE_DIR = ROOT_DIR / "resources" / "tibia"
 SNAPSHOT_DIR = RESOURCE_DIR / "snapshots"
 
 USER_AGENT = "Mozilla/5.0 (compatible; TibiaSearchBot/1.0)"
+FETCH_CHUNK_SIZE = 64 * 1024
+
+_WS_RE = re.compile(r"\s+")
+_CELL_TAGS = frozenset(("td", "th"))
+_ITEM_TABLE_HEADERS = frozenset(("item", "weight"))
+_ITEM_PREFIX_RE = re.compile(r"^item\s+", re.IGNORECASE)
+_NUM_RE = re.compile(r"\d+(?:\.\d+)?")
+
+
+_NAME_COLUMNS = ("item", "name")
+_WEIGHT_COLUMNS = ("weight",)
+_CATEGORY_COLUMNS = ("category", "type")
+_PROVIDERS_CREATURE_COLUMNS = ("dropped by", "creature", "creatures", "dropped")
+_PROVIDERS_DELIVERY_COLUMNS = ("npc", "from", "provider")
 
 
-@dataclass
+@dataclass(slots=True)
 class HtmlCell:
     text: str
     links: tuple[str, ...]
@@ -40,10 +69,13 @@ class TableParser(HTMLParser):
         self._in_cell = False
         self._current_table: list[list[HtmlCell]] = []
         self._current_row: list[HtmlCell] = []
+        # One entry per text run; a run that straddles two feed() calls arrives as several handle_data calls.
         self._cell_text: list[str] = []
         self._cell_links: list[str] = []
+        self._in_text_run = False
 
     def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self._in_text_run = False
         if tag == "table":
             self._in_table = True
             self._current_table = []
@@ -52,7 +84,7 @@ class TableParser(HTMLParser):
         if tag == "tr":
             self._in_row = True
             self._current_row = []
-        elif tag in {"td", "th"} and self._in_row:
+        elif tag in _CELL_TAGS and self._in_row:
             self._in_cell = True
             self._cell_text = []
             self._cell_links = []
@@ -62,10 +94,19 @@ class TableParser(HTMLParser):
                     self._cell_links.append(value)
 
     def handle_data(self, data: str) -> None:
-        if self._in_cell:
+        if not self._in_cell:
+            return
+        if self._in_text_run:
+            self._cell_text[-1] += data
+        else:
             self._cell_text.append(data)
+            self._in_text_run = True
+
+    def handle_comment(self, data: str) -> None:
+        self._in_text_run = False
 
     def handle_endtag(self, tag: str) -> None:
+        self._in_text_run = False
         if tag == "table" and self._in_table:
             self._in_table = False
             if self._current_table:
@@ -76,9 +117,10 @@ class TableParser(HTMLParser):
             if self._current_row:
                 self._current_table.append(self._current_row)
             self._current_row = []
-        elif tag in {"td", "th"} and self._in_cell:
+        elif tag in _CELL_TAGS and self._in_cell:
             self._in_cell = False
-            text = " ".join(part.strip() for part in self._cell_text if part.strip())
+            # One split/join pass collapses whitespace across and within runs, matching the lxml path.
+            text = " ".join(" ".join(self._cell_text).split())
             self._current_row.append(HtmlCell(text=text, links=tuple(self._cell_links)))
             self._cell_text = []
             self._cell_links = []
@@ -93,27 +135,83 @@ def iso_timestamp() -> str:
 
 
 def fetch_html(url: str) -> str:
+    return "".join(iter_html(url))
+
+
+def iter_html(url: str) -> Iterator[str]:
+    """Yield the decoded page as it arrives so the parser never needs the whole payload at once."""
+
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
     request = Request(url, headers={"User-Agent": USER_AGENT})
+    # urlopen follows redirects and honours proxy settings; each page is fetched once, so no pooling is needed.
     try:
         with urlopen(request, timeout=30) as response:
-            payload = response.read()
-    except URLError as exc:
+            while chunk := response.read(FETCH_CHUNK_SIZE):
+                if text := decoder.decode(chunk):
+                    yield text
+    except (OSError, HTTPException) as exc:
         raise FetchError(str(exc)) from exc
-    return payload.decode("utf-8", errors="replace")
+    if tail := decoder.decode(b"", final=True):
+        yield tail
+
 
+def parse_tables(html: str | Iterable[str]) -> list[list[list[HtmlCell]]]:
+    """Parse a whole document or an iterable of decoded chunks (e.g. from ``iter_html``)."""
 
-def parse_tables(html: str) -> list[list[list[HtmlCell]]]:
+    chunks = (html,) if isinstance(html, str) else html
+    if lxml_html is not None:
+        return _parse_tables_lxml(chunks)
     parser = TableParser()
-    parser.feed(html)
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.close()
     return parser.tables
 
 
+def _parse_tables_lxml(chunks: Iterable[str]) -> list[list[list[HtmlCell]]]:
+    """Extract tables with lxml's C parser; same ``HtmlCell`` rows as ``TableParser``."""
+
+    parser = lxml_html.HTMLParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    try:
+        root = parser.close()
+    except lxml_etree.LxmlError:
+        root = None
+    # An empty body has no root (or fails to close); like TableParser, report no tables and let the caller
+    # raise "table not found".
+    if root is None:
+        return []
+    tables: list[list[list[HtmlCell]]] = []
+    for table_node in root.iter("table"):
+        rows: list[list[HtmlCell]] = []
+        for row_node in table_node.iter("tr"):
+            cells = [
+                HtmlCell(
+                    text=" ".join(" ".join(cell.itertext()).split()),
+                    links=tuple(href for link in cell.iter("a") if (href := link.get("href"))),
+                )
+                for cell in row_node
+                if cell.tag in _CELL_TAGS
+            ]
+            if cells:
+                rows.append(cells)
+        if rows:
+            tables.append(rows)
+    return tables
+
+
+@lru_cache(maxsize=8192)
 def normalize_header(value: str) -> str:
-    return re.sub(r"\s+", " ", value.strip().lower())
+    return _WS_RE.sub(" ", value.strip().lower())
 
 
+@lru_cache(maxsize=8192)
 def slugify(name: str) -> str:
     cleaned = name.replace("’", "'").replace("‘", "'")
+    if cleaned.isascii():
+        # NFKD and the ASCII round-trip are no-ops for ASCII, which covers nearly every item name.
+        return quote(cleaned.replace(" ", "_"), safe="_")
     cleaned = unicodedata.normalize("NFKD", cleaned)
     cleaned = cleaned.encode("ascii", "ignore").decode("ascii")
     cleaned = cleaned.replace(" ", "_")
@@ -121,9 +219,7 @@ def slugify(name: str) -> str:
 
 
 def clean_item_name(name: str) -> str:
-    name = name.strip()
-    name = re.sub(r"^item\s+", "", name, flags=re.IGNORECASE)
-    return name.strip()
+    return _ITEM_PREFIX_RE.sub("", name.strip()).strip()
 
 
 def split_providers(raw: str) -> list[str]:
@@ -136,7 +232,7 @@ def split_providers(raw: str) -> list[str]:
 def parse_weight(raw: str) -> float:
     if not raw:
         return 0.0
-    match = re.search(r"\d+(?:\.\d+)?", raw.replace(",", "."))
+    match = _NUM_RE.search(raw.replace(",", "."))
     if not match:
         return 0.0
     return float(match.group(0))
@@ -144,37 +240,40 @@ def parse_weight(raw: str) -> float:
 
 def find_table(
     tables: Iterable[list[list[HtmlCell]]],
-    required_headers: set[str],
+    required_headers: frozenset[str],
 ) -> tuple[list[HtmlCell], list[list[HtmlCell]]] | None:
     for table in tables:
-        if not table:
+        if not table or len(table[0]) < len(required_headers):
             continue
         headers = table[0]
-        header_names = {normalize_header(cell.text) for cell in headers}
-        if required_headers.issubset(header_names):
-            return headers, table[1:]
+        remaining = set(required_headers)
+        for cell in headers:
+            remaining.discard(normalize_header(cell.text))
+            if not remaining:
+                return headers, table[1:]
     return None
 
 
 def find_column(headers: list[HtmlCell], candidates: Iterable[str]) -> int | None:
+    # Candidates are listed in priority order, so the first candidate that matches any header wins.
     normalized = [normalize_header(cell.text) for cell in headers]
-    for idx, name in enumerate(normalized):
-        for candidate in candidates:
+    for candidate in candidates:
+        for idx, name in enumerate(normalized):
             if candidate in name:
                 return idx
     return None
 
 
-def parse_creature_products(html: str) -> list[dict[str, object]]:
+def parse_creature_products(html: str | Iterable[str]) -> list[dict[str, object]]:
     tables = parse_tables(html)
-    table = find_table(tables, {"item", "weight"})
+    table = find_table(tables, _ITEM_TABLE_HEADERS)
     if not table:
         raise FetchError("Creature products table not found")
     headers, rows = table
-    name_idx = find_column(headers, ["item", "name"]) or 0
-    weight_idx = find_column(headers, ["weight"]) or 0
-    providers_idx = find_column(headers, ["dropped by", "creature", "creatures", "dropped"])
-    category_idx = find_column(headers, ["category", "type"]) or None
+    name_idx = find_column(headers, _NAME_COLUMNS) or 0
+    weight_idx = find_column(headers, _WEIGHT_COLUMNS) or 0
+    providers_idx = find_column(headers, _PROVIDERS_CREATURE_COLUMNS)
+    category_idx = find_column(headers, _CATEGORY_COLUMNS) or None
 
     items: list[dict[str, object]] = []
     for row in rows:
@@ -200,16 +299,16 @@ def parse_creature_products(html: str) -> list[dict[str, object]]:
     return items
 
 
-def parse_delivery_items(html: str) -> list[dict[str, object]]:
+def parse_delivery_items(html: str | Iterable[str]) -> list[dict[str, object]]:
     tables = parse_tables(html)
-    table = find_table(tables, {"item", "weight"})
+    table = find_table(tables, _ITEM_TABLE_HEADERS)
     if not table:
         raise FetchError("Delivery task items table not found")
     headers, rows = table
-    name_idx = find_column(headers, ["item", "name"]) or 0
-    weight_idx = find_column(headers, ["weight"]) or 0
-    providers_idx = find_column(headers, ["npc", "from", "provider"]) or None
-    category_idx = find_column(headers, ["category", "type"]) or None
+    name_idx = find_column(headers, _NAME_COLUMNS) or 0
+    weight_idx = find_column(headers, _WEIGHT_COLUMNS) or 0
+    providers_idx = find_column(headers, _PROVIDERS_DELIVERY_COLUMNS) or None
+    category_idx = find_column(headers, _CATEGORY_COLUMNS) or None
 
     items: list[dict[str, object]] = []
     for row in rows:
@@ -240,10 +339,20 @@ def parse_delivery_items(html: str) -> list[dict[str, object]]:
 
 
 def load_snapshot(path: Path, description: str) -> dict[str, object]:
-    if not path.exists():
-        raise FetchError(f"Missing snapshot for {description}: {path}")
-    with path.open("r", encoding="utf-8") as handle:
-        return json.load(handle)
+    """Return the parsed snapshot, memoized per file version; callers must treat it as read-only."""
+
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        raise FetchError(f"Missing snapshot for {description}: {path}") from None
+    return _load_snapshot_cached(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=8)
+def _load_snapshot_cached(path: str, mtime_ns: int, size: int) -> dict[str, object]:
+    del mtime_ns, size  # cache key only
+    with open(path, "rb") as handle:
+        return load_json_bytes(handle.read())
 
 
 def write_resource(path: Path, source_name: str, source_url: str, items: list[dict[str, object]]) -> None:
@@ -254,16 +363,15 @@ def write_resource(path: Path, source_name: str, source_url: str, items: list[di
             "url": source_url,
             "fetched_at": iso_timestamp(),
         },
-        "items": sorted(items, key=lambda item: item["name"].lower()),
+        "items": sorted(items, key=lambda item: item["name"].casefold()),
     }
     path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(payload, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    path.write_bytes(dump_json_bytes(payload))
 
 
 def refresh_creature_products() -> None:
     try:
-        html = fetch_html(CREATURE_PRODUCTS_URL)
-        items = parse_creature_products(html)
+        items = parse_creature_products(iter_html(CREATURE_PRODUCTS_URL))
     except FetchError:
         snapshot = load_snapshot(SNAPSHOT_DIR / "creature_products.json", "creature products")
         items = snapshot.get("items", [])
@@ -277,8 +385,7 @@ def refresh_creature_products() -> None:
 
 def refresh_delivery_items() -> None:
     try:
-        html = fetch_html(DELIVERY_TASK_ITEMS_URL)
-        items = parse_delivery_items(html)
+        items = parse_delivery_items(iter_html(DELIVERY_TASK_ITEMS_URL))
     except FetchError:
         snapshot = load_snapshot(SNAPSHOT_DIR / "delivery_task_items.json", "delivery task items")
         items = snapshot.get("items", [])
@@ -291,8 +398,11 @@ def refresh_delivery_items() -> None:
 
 
 def main() -> int:
-    refresh_creature_products()
-    refresh_delivery_items()
+    # The two pages live on different hosts and write different files, so their fetches can overlap.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(refresh) for refresh in (refresh_creature_products, refresh_delivery_items)]
+        for future in futures:
+            future.result()
     return 0
 
 
@@ -1,9 +1,16 @@
+import io
 import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
 import threading
 import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 from typing import Any
-from unittest import TestCase
+from unittest import TestCase, skipUnless
 from unittest.mock import patch
 
 import scripts.refresh_market_prices as rmp
@@ -17,16 +24,15 @@ class _MockResponse:
     def read(self) -> bytes:
         return json.dumps(self.payload).encode("utf-8")
 
-    def __enter__(self) -> "_MockResponse":
-        return self
-
-    def __exit__(self, exc_type, exc, tb) -> None:  # noqa: ANN001
-        return None
+    def json(self) -> Any:
+        return json.loads(self.read().decode("utf-8"))
 
 
 class MarketRefreshTests(TestCase):
     def setUp(self) -> None:
-        self.temp_dir = Path(self._tmpdir())
+        temp_dir = tempfile.TemporaryDirectory(prefix="market-refresh-")
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_dir = Path(temp_dir.name)
         tibia_dir = self.temp_dir / "resources" / "tibia"
         tibia_dir.mkdir(parents=True, exist_ok=True)
 
@@ -59,14 +65,16 @@ class MarketRefreshTests(TestCase):
         rmp.ITEM_IDS_CACHE_FILE = self.ids_cache_file
         with rmp._SESSION_REFRESH_LOCK:
             rmp._SESSION_REFRESHED_SERVERS.clear()
+        # Per-host throttles outlive a refresher; a 429 deferral from one test must not stall the next.
+        with rmp.Throttle._shared_lock:
+            rmp.Throttle._shared.clear()
+        # The item IDs flight is module-wide; give each test its own so last_result cannot leak.
+        flight_patch = patch.object(rmp, "_ITEM_IDS_FLIGHT", rmp._ServerFlight())
+        flight_patch.start()
+        self.addCleanup(flight_patch.stop)
 
         self.addCleanup(self._restore_paths)
 
-    def _tmpdir(self) -> str:
-        import tempfile
-
-        return tempfile.mkdtemp(prefix="market-refresh-")
-
     def _restore_paths(self) -> None:
         rmp.RESOURCE_DIR, rmp.CACHE_FILE, rmp.ITEM_IDS_CACHE_FILE = self._original_paths  # type: ignore[misc]
 
@@ -85,12 +93,12 @@ class MarketRefreshTests(TestCase):
             _MockResponse({"servers": {"Xyla": {"last_update": "2024-01-01T00:00:00Z"}}}),
         ]
 
-        with patch("scripts.refresh_market_prices.urlopen", side_effect=responses) as mock_urlopen:
+        with patch("scripts.refresh_market_prices.HttpSession.get", side_effect=responses) as mock_get:
             refresher = rmp.MarketRefresher(resource_dir=rmp.RESOURCE_DIR, log=None, throttle_seconds=0.0)
             result = refresher.refresh_server("Xyla")
 
         self.assertTrue(result.get("skipped"))
-        self.assertEqual(mock_urlopen.call_count, 1)
+        self.assertEqual(mock_get.call_count, 1)
 
     def test_handles_retry_after_and_marks_throttle(self) -> None:
         world_response = _MockResponse({"servers": {"Xyla": {"last_update": "2024-02-01T00:00:00Z"}}})
@@ -105,12 +113,13 @@ class MarketRefreshTests(TestCase):
         responses: list[Any] = [world_response, retry_error, market_success]
         sleeps: list[float] = []
 
-        def fake_sleep(seconds: float) -> None:
+        def fake_wait(seconds: float) -> bool:
             sleeps.append(seconds)
+            return False
 
         with (
-            patch("scripts.refresh_market_prices.urlopen", side_effect=responses),
-            patch("scripts.refresh_market_prices.time.sleep", side_effect=fake_sleep),
+            patch("scripts.refresh_market_prices.HttpSession.get", side_effect=responses),
+            patch.object(rmp._SHUTDOWN, "wait", side_effect=fake_wait),
             patch("scripts.refresh_market_prices.random.uniform", return_value=0.2),
         ):
             refresher = rmp.MarketRefresher(resource_dir=rmp.RESOURCE_DIR, log=None, throttle_seconds=0.0)
@@ -119,13 +128,129 @@ class MarketRefreshTests(TestCase):
         self.assertEqual(result.get("updated_items"), 4)  # two lists * two items
         self.assertIn(2.2, sleeps)  # 2s retry-after + 0.2 jitter
 
+    def test_unchanged_prices_skip_resource_writes(self) -> None:
+        world_response = _MockResponse({"servers": {"Xyla": {"last_update": "2024-02-01T00:00:00Z"}}})
+        market_response = _MockResponse([{"id": 1, "sell_offer": -1}, {"id": 2, "sell_offer": -1}])
+
+        with (
+            patch("scripts.refresh_market_prices.HttpSession.get", side_effect=[world_response, market_response]),
+            patch("scripts.refresh_market_prices.save_json") as mock_save,
+        ):
+            refresher = rmp.MarketRefresher(resource_dir=rmp.RESOURCE_DIR, log=None, throttle_seconds=0.0)
+            result = refresher.refresh_server("Xyla")
+
+        self.assertEqual(result.get("updated_items"), 4)
+        mock_save.assert_not_called()
+
+    def test_failed_batch_without_partial_refresh_saves_nothing(self) -> None:
+        world_response = _MockResponse({"servers": {"Xyla": {"last_update": "2024-02-01T00:00:00Z"}}})
+        not_found = rmp.HTTPError(url="http://example", code=404, msg="Not Found", hdrs={}, fp=None)
+
+        with (
+            patch("scripts.refresh_market_prices.HttpSession.get", side_effect=[world_response, not_found]),
+            patch("scripts.refresh_market_prices.save_json") as mock_save,
+        ):
+            refresher = rmp.MarketRefresher(
+                resource_dir=rmp.RESOURCE_DIR,
+                log=None,
+                throttle_seconds=0.0,
+                allow_partial_refresh=False,
+            )
+            result = refresher.refresh_server("Xyla")
+
+        self.assertEqual(result.get("error"), "failed_batches")
+        self.assertEqual(result.get("failed_batches"), 1)
+        mock_save.assert_not_called()
+        self.assertFalse(self.meta_file.exists())
+
+    def test_refresh_market_prices_closes_its_session(self) -> None:
+        world_response = _MockResponse({"servers": {"Xyla": {"last_update": "2024-02-01T00:00:00Z"}}})
+        market_response = _MockResponse([{"id": 1, "sell_offer": 5}, {"id": 2, "sell_offer": 6}])
+        messages: list[str] = []
+
+        with (
+            patch("scripts.refresh_market_prices.HttpSession.get", side_effect=[world_response, market_response]),
+            patch("scripts.refresh_market_prices.HttpSession.close") as mock_close,
+        ):
+            result = rmp.refresh_market_prices("Xyla", log=messages.append)
+
+        self.assertEqual(result.get("updated_items"), 4)
+        self.assertTrue(any(message.startswith("GET ") for message in messages))
+        mock_close.assert_called_once_with()
+
+    def test_interpreter_exit_interrupts_retry_after(self) -> None:
+        items = [{"name": f"Item {item_id}", "id": item_id, "gold": 0} for item_id in range(1, 2001)]
+        self.creature_path.write_text(json.dumps({"items": items}), encoding="utf-8")
+        # The app refreshes from a daemon thread; closing it while the API asks for a long back-off must not
+        # wait out the Retry-After, nor run the 19 batches still queued behind it.
+        script = f"""
+import threading
+from unittest.mock import patch
+from pathlib import Path
+import scripts.refresh_market_prices as rmp
+
+rate_limited = threading.Event()
+
+def get(url):
+    if "world_data" in url:
+        return rmp.HttpResponse(status=200, headers={{}}, body=b'{{"servers": {{"Xyla": {{"last_update": "now"}}}}}}')
+    rate_limited.set()
+    raise rmp.HTTPError(url, 429, "Too Many Requests", {{"Retry-After": "30"}}, None)
+
+patch("scripts.refresh_market_prices.HttpSession.get", side_effect=get).start()
+refresher = rmp.MarketRefresher(resource_dir=Path({str(self.creature_path.parent)!r}), throttle_seconds=0.0, concurrency=1)
+threading.Thread(target=refresher.refresh_server, args=("Xyla",), daemon=True).start()
+rate_limited.wait(10)
+"""
+        start = time.monotonic()
+        subprocess.run([sys.executable, "-c", script], cwd=Path(__file__).resolve().parent, check=True, timeout=60)
+        self.assertLess(time.monotonic() - start, 5.0)
+
+    def test_write_json_atomic_skips_identical_content(self) -> None:
+        target = self.temp_dir / "payload.json"
+        rmp.write_json_atomic(target, {"items": [1, 2]})
+        os.utime(target, ns=(0, 0))
+
+        rmp.write_json_atomic(target, {"items": [1, 2]})
+        self.assertEqual(target.stat().st_mtime_ns, 0)
+
+        rmp.write_json_atomic(target, {"items": [1, 3]})
+        self.assertNotEqual(target.stat().st_mtime_ns, 0)
+        self.assertEqual(json.loads(target.read_text(encoding="utf-8")), {"items": [1, 3]})
+
+    def test_resolves_missing_ids_from_item_ids_cache(self) -> None:
+        self.delivery_path.write_text(json.dumps({"items": [{"name": "Baz", "gold": 0}]}), encoding="utf-8")
+        self.ids_cache_file.write_text(
+            json.dumps({"fetched_at": rmp.iso_timestamp(), "items": {"baz": 3}}),
+            encoding="utf-8",
+        )
+        world_response = _MockResponse({"servers": {"Xyla": {"last_update": "2024-02-01T00:00:00Z"}}})
+        market_response = _MockResponse([{"id": 1, "sell_offer": 5}, {"id": 2, "sell_offer": 6}, {"id": 3, "sell_offer": 7}])
+
+        with patch("scripts.refresh_market_prices.HttpSession.get", side_effect=[world_response, market_response]):
+            refresher = rmp.MarketRefresher(resource_dir=rmp.RESOURCE_DIR, log=None, throttle_seconds=0.0)
+            result = refresher.refresh_server("Xyla")
+
+        self.assertEqual(result.get("items_missing_ids"), 0)
+        delivery = json.loads(self.delivery_path.read_text(encoding="utf-8"))
+        self.assertEqual(delivery["items"], [{"name": "Baz", "gold": 7, "id": 3}])
+
     def test_single_flight_blocks_parallel_refreshes(self) -> None:
         world_response = _MockResponse({"servers": {"Xyla": {"last_update": "2024-03-01T00:00:00Z"}}})
         market_success = _MockResponse([{"id": 1, "sell_offer": 10}, {"id": 2, "sell_offer": 5}])
         responses: list[Any] = [world_response, market_success]
 
-        with patch("scripts.refresh_market_prices.urlopen", side_effect=responses * 2):
-            refresher = rmp.MarketRefresher(resource_dir=rmp.RESOURCE_DIR, log=None, throttle_seconds=0.0)
+        refresher = rmp.MarketRefresher(resource_dir=rmp.RESOURCE_DIR, log=None, throttle_seconds=0.0)
+        pending = iter(responses * 2)
+
+        def get_after_second_caller_joins(url: str) -> Any:
+            # Hold the first refresh open until the second thread is waiting on the flight.
+            deadline = time.monotonic() + 5.0
+            while refresher._flights["Xyla"].waiters == 0 and time.monotonic() < deadline:
+                time.sleep(0.005)
+            return next(pending)
+
+        with patch("scripts.refresh_market_prices.HttpSession.get", side_effect=get_after_second_caller_joins):
             results: list[dict] = []
 
             def run_refresh() -> None:
@@ -146,14 +271,253 @@ class MarketRefreshTests(TestCase):
         world_response = _MockResponse({"servers": {"Xyla": {"last_update": "2024-04-01T00:00:00Z"}}})
         market_success = _MockResponse([{"id": 1, "sell_offer": 10}, {"id": 2, "sell_offer": 5}])
 
-        with patch("scripts.refresh_market_prices.urlopen", side_effect=[world_response, market_success]):
+        with patch("scripts.refresh_market_prices.HttpSession.get", side_effect=[world_response, market_success]):
             refresher = rmp.MarketRefresher(resource_dir=rmp.RESOURCE_DIR, log=None, throttle_seconds=0.0)
             first = refresher.refresh_server("Xyla")
 
-        with patch("scripts.refresh_market_prices.urlopen") as mock_urlopen:
+        with patch("scripts.refresh_market_prices.HttpSession.get") as mock_get:
             second = refresher.refresh_server("Xyla")
 
         self.assertEqual(first.get("updated_items"), 4)
         self.assertTrue(second.get("skipped"))
         self.assertEqual(second.get("status"), "session_skipped")
-        mock_urlopen.assert_not_called()
+        mock_get.assert_not_called()
+
+    def test_throttle_spaces_concurrent_workers(self) -> None:
+        throttle = rmp.Throttle(delay_seconds=10.0, burst=1)
+        sleeps: list[float] = []
+        lock = threading.Lock()
+
+        def fake_wait(seconds: float) -> bool:
+            with lock:
+                sleeps.append(seconds)
+            return False
+
+        with patch.object(rmp._SHUTDOWN, "wait", side_effect=fake_wait):
+            threads = [threading.Thread(target=throttle.wait) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        # The first waiter spends the burst token; the rest reserve slots one delay apart.
+        self.assertEqual([round(delay / 10.0) for delay in sorted(sleeps)], [1, 2, 3])
+
+    def test_concurrent_item_id_fetches_share_one_parse(self) -> None:
+        calls: list[int] = []
+
+        def fetch_after_others_join(log: Any = None) -> dict[str, int]:
+            calls.append(1)
+            # Hold the parse open until both other threads are waiting on the flight.
+            deadline = time.monotonic() + 5.0
+            while rmp._ITEM_IDS_FLIGHT.waiters < 2 and time.monotonic() < deadline:
+                time.sleep(0.005)
+            return {"foo": 1}
+
+        refresher = rmp.MarketRefresher(resource_dir=rmp.RESOURCE_DIR, log=None, throttle_seconds=0.0)
+        results: list[dict[str, int]] = []
+        with patch("scripts.refresh_market_prices.fetch_item_ids", side_effect=fetch_after_others_join):
+            threads = [threading.Thread(target=lambda: results.append(refresher._fetch_item_ids_once())) for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"foo": 1}] * 3)
+
+    def test_low_rate_limit_remaining_defers_next_request(self) -> None:
+        low_quota = _MockResponse(
+            [{"id": 1, "sell_offer": 10}],
+            headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "5"},
+        )
+        refresher = rmp.MarketRefresher(
+            resource_dir=rmp.RESOURCE_DIR,
+            log=None,
+            throttle_seconds=0.0,
+            market_values_url="https://rate-limit.invalid/market_values",
+        )
+
+        with patch("scripts.refresh_market_prices.HttpSession.get", return_value=low_quota):
+            values = refresher._fetch_market_batch("Xyla", [1])
+
+        self.assertEqual(values, {1: 10})
+        self.assertGreater(refresher._throttle.required_delay(), 4.0)
+
+
+class _SessionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self) -> None:
+        super().setup()
+        # One handler instance per TCP connection, so this counts connections the client opened.
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self) -> None:
+        status, body = {
+            "/ok": (200, b"hello"),
+            "/missing": (404, b"not here"),
+            "/broken": (503, b"try later"),
+            # Answer as keep-alive, then hang up: the client only notices on its next request.
+            "/hangup": (200, b"bye"),
+        }[self.path]
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if self.path == "/hangup":
+            self.close_connection = True
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class _SessionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _SessionHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # Clients that abandon a response reset the socket; that is the behaviour under test.
+        pass
+
+
+class HttpSessionTests(TestCase):
+    def setUp(self) -> None:
+        server = _SessionServer()
+        threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.server = server
+        self.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        self.session = rmp.HttpSession(timeout=5)
+        self.addCleanup(self.session.close)
+
+    def test_reuses_one_connection(self) -> None:
+        for _ in range(3):
+            self.assertEqual(self.session.get(f"{self.base_url}/ok").body, b"hello")
+        self.assertEqual(self.server.connections, 1)
+
+    def test_retries_once_when_pooled_connection_was_dropped(self) -> None:
+        self.assertEqual(self.session.get(f"{self.base_url}/hangup").body, b"bye")
+        self.assertEqual(self.session.get(f"{self.base_url}/ok").body, b"hello")
+        self.assertEqual(self.server.connections, 2)
+
+    def test_error_status_raises_http_error_and_keeps_connection(self) -> None:
+        for path, status in (("/missing", 404), ("/broken", 503)):
+            with self.subTest(path=path), self.assertRaises(rmp.HTTPError) as caught:
+                self.session.get(f"{self.base_url}{path}")
+            self.assertEqual(caught.exception.code, status)
+        # The error bodies were drained, so the same connection still serves the next request.
+        self.assertEqual(self.session.get(f"{self.base_url}/ok").body, b"hello")
+        self.assertEqual(self.server.connections, 1)
+
+    def test_connection_failure_raises_url_error(self) -> None:
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            closed_port = probe.getsockname()[1]
+        with self.assertRaises(rmp.URLError) as caught:
+            self.session.get(f"http://127.0.0.1:{closed_port}/ok")
+        self.assertNotIsInstance(caught.exception, rmp.HTTPError)
+
+    def test_close_reaches_connections_of_other_threads(self) -> None:
+        worker = threading.Thread(target=self.session.get, args=(f"{self.base_url}/ok",))
+        worker.start()
+        worker.join()
+        opened = list(self.session._opened)
+
+        self.session.close()
+
+        self.assertEqual(len(opened), 1)
+        self.assertIsNone(opened[0].sock)
+
+
+_TABLES_HTML = """<html><body>
+<table class="infobox"><tr><th>Version</th><td>13.40</td></tr></table>
+<p>Between the tables</p>
+<table class="wikitable">
+  <tr><th>Name</th><th> Item
+    ID </th><th>Notes</th></tr>
+  <tr><td><a href="/wiki/Dragon_Ham">Dragon</a> <b>Ham</b></td><td>3583</td><td>food <!-- hidden --> item</td></tr>
+  <tr><td>Rope&nbsp;Belt</td><td>3031, 3032</td><td><i>a</i><i>b</i></td></tr>
+  <tr><td>  Spaced\n\tout  </td><td>  17  </td><td></td></tr>
+</table>
+</body></html>"""
+
+# The saved dump is a view-source page: markup arrives escaped inside highlighting spans.
+_VIEW_SOURCE_HTML = (
+    '<span class="start-tag">&lt;table&gt;</span>&lt;tr&gt;&lt;th&gt;Name&lt;/th&gt;&lt;th&gt;ID&lt;/th&gt;&lt;/tr&gt;'
+    '<span class="start-tag">&lt;tr&gt;</span>&lt;td&gt;<a href="x">Fish &amp; Chips</a>&lt;/td&gt;&lt;td&gt;12&lt;/td&gt;&lt;/tr&gt;'
+    "&lt;tr&gt;&lt;td&gt;Caf&eacute; &#39;Tea&#39;&lt;/td&gt;&lt;td&gt;345&lt;/td&gt;&lt;/tr&gt;&lt;/table&gt;"
+)
+
+
+def _texts(tables: list[list[list[Any]]]) -> list[list[list[str]]]:
+    return [[[cell.text for cell in row] for row in table] for table in tables]
+
+
+def _reference_tables(html: str) -> list[list[list[str]]]:
+    parser = rmp.TableParser()
+    parser.feed(html)
+    parser.close()
+    return _texts(parser.tables)
+
+
+class TableBackendTests(TestCase):
+    """The optional C parsers must produce the same cells as the pure-Python ``TableParser``."""
+
+    def test_table_parser_reference(self) -> None:
+        self.assertEqual(
+            _reference_tables(_TABLES_HTML),
+            [
+                [["Version", "13.40"]],
+                [
+                    ["Name", "Item ID", "Notes"],
+                    ["Dragon Ham", "3583", "food item"],
+                    ["Rope Belt", "3031, 3032", "a b"],
+                    ["Spaced out", "17", ""],
+                ],
+            ],
+        )
+
+    @skipUnless(rmp.FastHTMLParser is not None, "selectolax not installed")
+    def test_selectolax_matches_table_parser(self) -> None:
+        self.assertEqual(_texts(rmp._parse_tables_fast(_TABLES_HTML)), _reference_tables(_TABLES_HTML))
+
+    @skipUnless(rmp.lxml_html is not None, "lxml not installed")
+    def test_lxml_matches_table_parser(self) -> None:
+        self.assertEqual(_texts(rmp._parse_tables_lxml(_TABLES_HTML)), _reference_tables(_TABLES_HTML))
+        self.assertEqual(rmp._parse_tables_lxml(""), [])
+
+    @skipUnless(rmp.lxml_etree is not None, "lxml not installed")
+    def test_lxml_stream_matches_table_parser(self) -> None:
+        expected = _reference_tables(rmp.strip_highlight_wrappers(_VIEW_SOURCE_HTML))
+        tables = rmp._stream_tables_lxml(io.StringIO(_VIEW_SOURCE_HTML), frozenset(("name", "id")))
+        self.assertEqual(_texts(tables), expected)
+        self.assertEqual(rmp._stream_tables_lxml(io.StringIO(""), frozenset(("name", "id"))), [])
+
+    def test_iter_stripped_chunks_matches_whole_document(self) -> None:
+        expected = rmp.strip_highlight_wrappers(_VIEW_SOURCE_HTML)
+        self.assertIn("Fish & Chips", expected)
+        for chunk_size in range(1, 41):
+            with self.subTest(chunk_size=chunk_size):
+                chunks = rmp.iter_stripped_chunks(io.StringIO(_VIEW_SOURCE_HTML), chunk_size)
+                self.assertEqual("".join(chunks), expected)
+
+    def test_first_int(self) -> None:
+        cases = {
+            "3583": 3583,
+            "3031, 3032": 3031,
+            "ID 42 (old)": 42,
+            "007": 7,
+            "": None,
+            "n/a": None,
+            "\u0661\u0662": None,  # non-ASCII digits are not item IDs
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(rmp._first_int(text), expected)
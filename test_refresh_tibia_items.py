@@ -0,0 +1,114 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from unittest.mock import patch
+
+import scripts.refresh_tibia_items as rti
+
+
+PRODUCTS_HTML = """<html><body>
+<table><tr><td>Navigation</td></tr></table>
+<table class="wikitable">
+  <tr><th>Item</th><th>Weight</th><th>Dropped By</th></tr>
+  <tr><td><a href="/wiki/Demon_Horn">Demon Horn</a></td><td>2.90 oz</td><td><a href="/wiki/Demon">Demon</a>, <a href="">Juggernaut</a></td></tr>
+  <tr><td>Item <b>Rope</b> Belt</td><td>1,50 oz.</td><td>Orc <!-- note --> Elf</td></tr>
+  <tr><td>  Spaced
+    out </td><td>3</td><td></td></tr>
+</table>
+</body></html>"""
+
+
+def _cells(tables: list[list[list[Any]]]) -> list[list[list[tuple[str, tuple[str, ...]]]]]:
+    return [[[(cell.text, cell.links) for cell in row] for row in table] for table in tables]
+
+
+def _reference_tables(html: str) -> list[list[list[tuple[str, tuple[str, ...]]]]]:
+    parser = rti.TableParser()
+    parser.feed(html)
+    parser.close()
+    return _cells(parser.tables)
+
+
+class TableParserTests(unittest.TestCase):
+    def test_table_parser_reference(self) -> None:
+        tables = _reference_tables(PRODUCTS_HTML)
+        self.assertEqual(len(tables), 2)
+        self.assertEqual(
+            tables[1],
+            [
+                [("Item", ()), ("Weight", ()), ("Dropped By", ())],
+                [("Demon Horn", ("/wiki/Demon_Horn",)), ("2.90 oz", ()), ("Demon , Juggernaut", ("/wiki/Demon",))],
+                [("Item Rope Belt", ()), ("1,50 oz.", ()), ("Orc Elf", ())],
+                [("Spaced out", ()), ("3", ()), ("", ())],
+            ],
+        )
+
+    @unittest.skipUnless(rti.lxml_html is not None, "lxml not installed")
+    def test_lxml_matches_table_parser(self) -> None:
+        expected = _reference_tables(PRODUCTS_HTML)
+        self.assertEqual(_cells(rti._parse_tables_lxml((PRODUCTS_HTML,))), expected)
+        chunks = [PRODUCTS_HTML[start : start + 7] for start in range(0, len(PRODUCTS_HTML), 7)]
+        self.assertEqual(_cells(rti._parse_tables_lxml(chunks)), expected)
+
+    def test_empty_body_reports_missing_table(self) -> None:
+        # None selects the pure-Python TableParser.
+        backends = [None] if rti.lxml_html is None else [None, rti.lxml_html]
+        for backend in backends:
+            for body in ("", [], ["", "  "]):
+                with self.subTest(backend=backend, body=body), patch.object(rti, "lxml_html", backend):
+                    self.assertEqual(rti.parse_tables(body), [])
+                    with self.assertRaises(rti.FetchError):
+                        rti.parse_creature_products(body)
+
+    def test_parse_creature_products(self) -> None:
+        items = rti.parse_creature_products(PRODUCTS_HTML)
+        self.assertEqual([item["name"] for item in items], ["Demon Horn", "Rope Belt", "Spaced out"])
+        self.assertEqual(items[0]["providers"], ["Demon", "Juggernaut"])
+        self.assertEqual(items[1]["weight"], 1.5)
+
+
+class _PageHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        status, body, location = {
+            "/Creature_Products": (200, PRODUCTS_HTML.encode("utf-8"), None),
+            "/moved": (301, b"", "/Creature_Products"),
+            "/gone": (404, b"not here", None),
+            "/empty": (200, b"", None),
+        }[self.path]
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        if location:
+            self.send_header("Location", location)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class FetchTests(unittest.TestCase):
+    def setUp(self) -> None:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _PageHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def test_follows_redirects(self) -> None:
+        items = rti.parse_creature_products(rti.iter_html(f"{self.base_url}/moved"))
+        self.assertEqual([item["name"] for item in items], ["Demon Horn", "Rope Belt", "Spaced out"])
+
+    def test_empty_page_raises_fetch_error(self) -> None:
+        # FetchError is what makes the refresh fall back to the snapshot.
+        with self.assertRaises(rti.FetchError):
+            rti.parse_delivery_items(rti.iter_html(f"{self.base_url}/empty"))
+
+    def test_error_status_raises_fetch_error(self) -> None:
+        with self.assertRaises(rti.FetchError):
+            rti.fetch_html(f"{self.base_url}/gone")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -14,13 +14,14 @@ class TestCreatureProductsResource(unittest.TestCase):
     def setUpClass(cls) -> None:
         with CREATURE_PRODUCTS_PATH.open("r", encoding="utf-8") as handle:
             cls.resource = json.load(handle)
+        cls.items = cls.resource.get("items", [])
+        cls.items_by_name = {item["name"]: item for item in cls.items}
 
     def test_items_present(self) -> None:
-        items = self.resource.get("items", [])
-        self.assertTrue(items)
+        self.assertTrue(self.items)
 
     def test_item_schema(self) -> None:
-        for item in self.resource.get("items", []):
+        for item in self.items:
             with self.subTest(item=item.get("name")):
                 self.assertTrue(item.get("name"))
                 self.assertIsInstance(item.get("weight"), (int, float))
@@ -33,10 +34,9 @@ class TestCreatureProductsResource(unittest.TestCase):
                 self.assertEqual(url[len(FANDOM_BASE):], slug)
 
     def test_known_items(self) -> None:
-        items_by_name = {item["name"]: item for item in self.resource.get("items", [])}
         for expected in ["Demon Horn", "Rope Belt", "Vampire Teeth"]:
             with self.subTest(expected=expected):
-                self.assertIn(expected, items_by_name)
+                self.assertIn(expected, self.items_by_name)
 
 
 class TestDeliveryItemsResource(unittest.TestCase):
@@ -44,13 +44,14 @@ class TestDeliveryItemsResource(unittest.TestCase):
     def setUpClass(cls) -> None:
         with DELIVERY_ITEMS_PATH.open("r", encoding="utf-8") as handle:
             cls.resource = json.load(handle)
+        cls.items = cls.resource.get("items", [])
+        cls.items_by_name = {item["name"]: item for item in cls.items}
 
     def test_items_present(self) -> None:
-        items = self.resource.get("items", [])
-        self.assertTrue(items)
+        self.assertTrue(self.items)
 
     def test_item_schema(self) -> None:
-        for item in self.resource.get("items", []):
+        for item in self.items:
             with self.subTest(item=item.get("name")):
                 self.assertTrue(item.get("name"))
                 self.assertIsInstance(item.get("weight"), (int, float))
@@ -59,10 +60,9 @@ class TestDeliveryItemsResource(unittest.TestCase):
                 self.assertIsInstance(providers, list)
 
     def test_known_items(self) -> None:
-        items_by_name = {item["name"]: item for item in self.resource.get("items", [])}
         for expected in ["Parcel", "Letter", "Present Box"]:
             with self.subTest(expected=expected):
-                self.assertIn(expected, items_by_name)
+                self.assertIn(expected, self.items_by_name)
 
 
 if __name__ == "__main__":
@@ -1,13 +1,34 @@
+import io
 import threading
+from functools import cache
 from typing import Callable, Optional
 
 try:
     import pystray
-    from PIL import Image, ImageDraw
+    from PIL import Image
 except Exception:  # pragma: no cover - optional dependency
     pystray = None
     Image = None
-    ImageDraw = None
+
+# 64x64 RGBA "T" badge, pre-rendered so the tray never has to rasterize it at startup.
+_ICON_PNG = (
+    b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00@\x00\x00\x00@\x08\x06\x00\x00\x00\xaaiq\xde\x00"
+    b"\x00\x00\xc8IDATx\xda\xed\xda1\x0e\x01A\x18\x05\xe0\xb7\xe2\x00N\xb0j\xadF$j\xa1\xd7\x89\x1bh"
+    b"\x9cD\x9ca\x0f\xa0\x92(\x94\x1a\x8dV\xed\x06n\xc0\x11\x16\xd5\xb2\xdf\xab\xa7\x99/\x7ff\xf2&S"
+    b"\x94e\xf9L\x8b\xd3I\xcb\x03\x00\x00\x00\x00\x00\xda\x9cn\xdd\x82\xed\xf1\xfe\xf3\x9b\xdc\xcc\xfa"
+    b"&\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x80\x0f\xbb\xc0\xbb\xb9\x9c\xf69T\xbb$\xc9\xedz"
+    b"\xce`8I\x92\xcc\x97\xeb\x8c\xa7\x8b\xc6\x02\x14u\x8f\xa2\xdf\x94\xa1\xd5\xa8\x97\xea\xf2P\x86"
+    b"\x9c\x01\x00\x00\x00\x00\xd0F\x80&]\x81&\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00"
+    b"\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\xc9\x1b\x7f\x84L\x00\x00"
+    b"\x00\x00\x00\x00\xf8\xdf\xbc\x00\xe8M\x18\xe9\xc7 \x82\x8c\x00\x00\x00\x00IEND\xaeB`\x82"
+)
+
+
+@cache
+def _icon_image() -> "Image.Image":
+    image = Image.open(io.BytesIO(_ICON_PNG))
+    image.load()
+    return image
 
 
 class TrayIcon:
@@ -15,17 +36,11 @@ class TrayIcon:
         self.on_open = on_open
         self.on_exit = on_exit
         self._is_running = False
+        # Built on the first show(), so headless runs never construct the image or menu.
         self.icon: Optional["pystray.Icon"] = None
-        if pystray is not None and Image is not None:
-            self.icon = pystray.Icon("TibiaSearch", self._create_image(), "Tibia Search", self._create_menu())
 
     def _create_image(self) -> "Image.Image":
-        size = 64
-        image = Image.new("RGBA", (size, size), (30, 30, 30, 255))
-        draw = ImageDraw.Draw(image)
-        draw.rectangle((8, 8, size - 8, size - 8), fill=(173, 214, 255, 255))
-        draw.text((18, 18), "T", fill=(0, 0, 0, 255))
-        return image
+        return _icon_image()
 
     def _create_menu(self) -> "pystray.Menu":
         return pystray.Menu(
@@ -40,8 +55,10 @@ class TrayIcon:
         self.on_exit()
 
     def show(self) -> None:
-        if self._is_running or self.icon is None:
+        if self._is_running or not self.available:
             return
+        if self.icon is None:
+            self.icon = pystray.Icon("TibiaSearch", self._create_image(), "Tibia Search", self._create_menu())
         self._is_running = True
         threading.Thread(target=self.icon.run, daemon=True).start()
 
@@ -52,4 +69,4 @@ class TrayIcon:
 
     @property
     def available(self) -> bool:
-        return self.icon is not None
+        return pystray is not None and Image is not None